@@ -0,0 +1,19 @@
+# The crawler, profiler and comparer as an importable library. Nothing here runs on import,
+# and pandas, openpyxl and the GUI libraries are only imported inside the functions that use them
+from .benchmark import change_tree, generate_tree, run_benchmarks
+from .comparer import compare_references, header_differences, profile_differences, reference_comparer
+from .crawler import (DEFAULT_EXCLUDE_GLOBS, DEFAULT_PRUNE_GLOBS, all_files, crawl_files, scan_directory,
+                      walk_directory)
+from .instrumentation import SLOWEST_FILES_SHOWN, LatencyHistogram, RunLog, summary_messages
+from .profiling import (CSV_FAST_SCAN_BYTES, DEFAULT_SCAN_ROWS, READERS, SKIPPED_TIMEOUT, SKIPPED_TOO_LARGE,
+                        ColumnProfile, FileTooLarge, MessageLog, csv_max_col, csv_profile, detect_csv_format,
+                        fast_csv_scan, file_fingerprint, get_col_count, get_headers_from_path, message_list,
+                        parquet_profile, profile_file, profile_files, reader_for, register_reader,
+                        registered_file_types, rows_profile, xlsx_profile)
+from .reference import (REFERENCE_CACHE_NAME, REFERENCE_COLUMNS, REFERENCE_FORMATS, ReferenceWriter, build_reference,
+                        clear_reference_cache, export_reference_csv, iter_reference_chunks, read_reference,
+                        write_reference)
+from .snapshots import (SNAPSHOT_STORE_NAME, compare_snapshots, header_history, headers_last_changed,
+                        import_reference, list_snapshots, read_snapshot)
+from .streaming_comparer import DEFAULT_MAX_ROWS_IN_MEMORY, external_sort, streaming_reference_comparer
+from .watcher import DEFAULT_POLL_SECONDS, watch_directory
@@ -0,0 +1,270 @@
+import csv
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# |||||||||||||||||||
+# BENCHMARKS
+# |||||||||||||||||||
+
+# Bumped whenever the shape of the results file changes, so old runs aren't compared wrongly
+BENCHMARK_VERSION = 1
+
+# Options of the synthetic tree, and their defaults. Shares are the fraction of files which are
+# xlsx, and of the csv files which are saved as UTF-16. header_offset is the number of title and
+# blank rows above the header row
+DEFAULT_TREE_OPTIONS = {"depth": 2,
+                        "fan_out": 3,
+                        "files": 200,
+                        "xlsx_share": 0.25,
+                        "rows": 200,
+                        "columns": 10,
+                        "header_offset": 2,
+                        "utf16_share": 0.05,
+                        "seed": 0}
+
+# Fraction of files changed between the two references that are compared
+CHANGED_FILE_SHARE = 0.1
+
+
+# |||||||||||||||||||
+# Synthetic trees
+# |||||||||||||||||||
+
+
+def write_table(path, file_kind, rows, columns, header_offset, header_prefix="Column"):
+    """Function to write one synthetic table. file_kind is 'csv', 'utf16' for a UTF-16
+    csv, or 'xlsx'. The header row comes after a title row and blank rows, header_offset
+    rows in total, and is followed by rows of mixed text and numbers"""
+    table_rows = []
+    if header_offset:
+        table_rows.append(["Synthetic report " + os.path.basename(path)])
+        table_rows.extend([] for _ in range(header_offset - 1))
+    table_rows.append([" ".join([header_prefix, str(col + 1)]) for col in range(columns)])
+    for row in range(rows):
+        table_rows.append([row * columns + col if col % 2 else "Value {} {}".format(row, col)
+                           for col in range(columns)])
+
+    if file_kind == "xlsx":
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        for table_row in table_rows:
+            worksheet.append(table_row)
+        workbook.save(path)
+    else:
+        with open(path, 'w', newline='', encoding="utf-16" if file_kind == "utf16" else "utf-8") as f:
+            csv.writer(f).writerows(table_rows)
+
+
+def tree_file_plan(root, depth, fan_out, files, xlsx_share, utf16_share, seed):
+    """Function to plan where each file of a synthetic tree goes and what kind it is.
+    Returns the directories to make, and a list of (path, file kind) for the files"""
+    directories = [root]
+    level = [root]
+    for level_number in range(depth):
+        level = [os.path.join(parent, "Folder {}-{}".format(level_number + 1, index))
+                 for parent in level for index in range(fan_out)]
+        directories.extend(level)
+
+    # Exact counts of each kind, shuffled so every directory gets a mix
+    xlsx_count = round(files * xlsx_share)
+    utf16_count = round((files - xlsx_count) * utf16_share)
+    file_kinds = ["xlsx"] * xlsx_count + ["utf16"] * utf16_count + ["csv"] * (files - xlsx_count - utf16_count)
+    random.Random(seed).shuffle(file_kinds)
+
+    file_plan = []
+    for index, file_kind in enumerate(file_kinds):
+        file_name = "Table {:06d}.{}".format(index, "xlsx" if file_kind == "xlsx" else "csv")
+        file_plan.append((os.path.join(directories[index % len(directories)], file_name), file_kind))
+    return directories, file_plan
+
+
+def generate_tree(root, depth=2, fan_out=3, files=200, xlsx_share=0.25, rows=200, columns=10, header_offset=2,
+                  utf16_share=0.05, seed=0):
+    """Function to generate a synthetic tree of tables to benchmark with. The tree is depth
+    levels of fan_out directories each, with files spread evenly over every directory.
+    Returns a dictionary describing the tree made"""
+    directories, file_plan = tree_file_plan(root, depth, fan_out, files, xlsx_share, utf16_share, seed)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+    for path, file_kind in file_plan:
+        write_table(path, file_kind, rows, columns, header_offset)
+
+    return {"Directories": len(directories),
+            "Files": len(file_plan),
+            "Xlsx Files": sum(file_kind == "xlsx" for path, file_kind in file_plan),
+            "UTF-16 Files": sum(file_kind == "utf16" for path, file_kind in file_plan),
+            "Bytes": sum(os.path.getsize(path) for path, file_kind in file_plan)}
+
+
+def change_tree(root, depth=2, fan_out=3, files=200, xlsx_share=0.25, rows=200, columns=10, header_offset=2,
+                utf16_share=0.05, seed=0, changed_share=CHANGED_FILE_SHARE):
+    """Function to change a tree made by generate_tree with the same options, so there
+    are differences to compare. Of changed_share of the files, a third are deleted and
+    the rest get new headers, and as many new files as were deleted are added"""
+    directories, file_plan = tree_file_plan(root, depth, fan_out, files, xlsx_share, utf16_share, seed)
+    changed_plan = random.Random(seed + 1).sample(file_plan, round(len(file_plan) * changed_share))
+    deleted_count = len(changed_plan) // 3
+    for path, file_kind in changed_plan[:deleted_count]:
+        os.remove(path)
+    for path, file_kind in changed_plan[deleted_count:]:
+        write_table(path, file_kind, rows, columns, header_offset, header_prefix="Changed Column")
+    for index in range(deleted_count):
+        path = os.path.join(directories[index % len(directories)], "Added Table {:06d}.csv".format(index))
+        write_table(path, "csv", rows, columns, header_offset)
+
+
+# |||||||||||||||||||
+# Timing phases
+# |||||||||||||||||||
+
+
+def peak_rss_bytes():
+    """Function to get the peak resident memory of this process and the child processes
+    it has waited for, in bytes. None where the resource module isn't available"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_phase(phase, phase_args):
+    """Function to time one phase in the process it's called in. Returns the wall time,
+    the number of files the phase covered, the peak memory of the process, and the
+    path of any file the phase saved"""
+    # Importing the libraries the app loads lazily first, so only the work itself is timed
+    for module_name in ("openpyxl", "pandas"):
+        importlib.import_module(module_name)
+
+    output_path = None
+    if phase == "all_files":
+        from .crawler import all_files
+        start = time.perf_counter()
+        files = len(all_files(phase_args["directory"]))
+        wall_seconds = time.perf_counter() - start
+    elif phase == "build_reference":
+        from .reference import build_reference
+        start = time.perf_counter()
+        run_summary = build_reference(phase_args["directory"], phase_args["save_folder"],
+                                      **phase_args["build_options"])
+        wall_seconds = time.perf_counter() - start
+        files = run_summary["Files Profiled"]
+        output_path = run_summary["Reference File"]
+    elif phase == "reference_comparer":
+        from .comparer import reference_comparer
+        from .reference import read_reference
+        start = time.perf_counter()
+        reference_comparer(phase_args["expected"], phase_args["actual"], ("FilePath", "Directory", "FileName"))
+        wall_seconds = time.perf_counter() - start
+        files = len(read_reference(phase_args["expected"], ["FilePath"]))
+    else:
+        raise ValueError("Unknown benchmark phase: " + str(phase))
+    return {"Wall Seconds": wall_seconds, "Files": files, "Peak RSS Bytes": peak_rss_bytes(), "Output": output_path}
+
+
+def time_phase(phase, phase_args, repeat):
+    """Function to run a phase repeat times, each in a fresh process so imports and peak
+    memory aren't shared between phases. Keeps the fastest wall time and highest memory"""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            runs.append(executor.submit(run_phase, phase, phase_args).result())
+
+    wall_seconds = min(run["Wall Seconds"] for run in runs)
+    peak_rss = [run["Peak RSS Bytes"] for run in runs if run["Peak RSS Bytes"] is not None]
+    return {"Wall Seconds": wall_seconds,
+            "Wall Seconds Runs": [run["Wall Seconds"] for run in runs],
+            "Files": runs[0]["Files"],
+            "Files Per Second": runs[0]["Files"] / wall_seconds if wall_seconds else None,
+            "Peak RSS Bytes": max(peak_rss) if peak_rss else None,
+            "Output": runs[-1]["Output"]}
+
+
+def run_benchmarks(output_path, tree_options=None, build_options=None, repeat=1, work_dir=None, baseline_path=None):
+    """Function to benchmark the crawler, reference builder and comparer on a synthetic
+    tree, see generate_tree for tree_options and build_reference for build_options.
+    Each phase is timed separately in its own process, repeat times. The tree and
+    references are made in work_dir, or a temp folder which is removed afterwards.
+    Results are saved as json at output_path, and compared with the results saved at
+    baseline_path if given. Returns the results"""
+    tree_options = {**DEFAULT_TREE_OPTIONS, **(tree_options or {})}
+    build_options = build_options or {}
+
+    import openpyxl
+    import pandas as pd
+
+    results = {"Benchmark Version": BENCHMARK_VERSION,
+               "Started": datetime.now().isoformat(timespec="seconds"),
+               "Environment": {"Python": platform.python_version(),
+                               "Platform": platform.platform(),
+                               "CPU Count": os.cpu_count(),
+                               "pandas": pd.__version__,
+                               "openpyxl": openpyxl.__version__},
+               "Tree Options": tree_options,
+               "Build Options": build_options,
+               "Repeat": repeat,
+               "Phases": {}}
+
+    temp_dir = None
+    if work_dir is None:
+        work_dir = temp_dir = tempfile.mkdtemp(prefix="table_crawler_benchmark_")
+    try:
+        tree_dir = os.path.join(work_dir, "Tree")
+        expected_dir = os.path.join(work_dir, "Expected Reference")
+        actual_dir = os.path.join(work_dir, "Actual Reference")
+        for directory in (expected_dir, actual_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        results["Tree"] = generate_tree(tree_dir, **tree_options)
+
+        results["Phases"]["all_files"] = time_phase("all_files", {"directory": tree_dir}, repeat)
+
+        build_args = {"directory": tree_dir, "save_folder": expected_dir, "build_options": build_options}
+        results["Phases"]["build_reference"] = time_phase("build_reference", build_args, repeat)
+
+        # Building a second reference after changing the tree, so the comparer has work to do
+        from .reference import build_reference
+        expected_path = results["Phases"]["build_reference"].pop("Output")
+        change_tree(tree_dir, **tree_options)
+        actual_path = build_reference(tree_dir, actual_dir, **build_options)["Reference File"]
+
+        compare_args = {"expected": expected_path, "actual": actual_path}
+        results["Phases"]["reference_comparer"] = time_phase("reference_comparer", compare_args, repeat)
+        for phase_results in results["Phases"].values():
+            phase_results.pop("Output", None)
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if baseline_path is not None:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        results["Baseline"] = baseline_path
+        # Times from a different tree or build can't be compared fairly, so that's flagged
+        results["Baseline Matches"] = (baseline.get("Benchmark Version") == BENCHMARK_VERSION
+                                       and baseline.get("Tree Options") == tree_options
+                                       and baseline.get("Build Options") == build_options)
+        for phase, phase_results in results["Phases"].items():
+            baseline_phase = baseline.get("Phases", {}).get(phase)
+            if baseline_phase and baseline_phase["Wall Seconds"]:
+                # Above 1 is slower than the baseline
+                phase_results["Wall Time vs Baseline"] = phase_results["Wall Seconds"] / baseline_phase["Wall Seconds"]
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    return results
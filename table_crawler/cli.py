@@ -0,0 +1,258 @@
+import argparse
+import json
+import sys
+
+from .benchmark import DEFAULT_TREE_OPTIONS, run_benchmarks
+from .comparer import reference_comparer
+from .crawler import DEFAULT_EXCLUDE_GLOBS, DEFAULT_PRUNE_GLOBS
+from .gui import run_gui
+from .instrumentation import RunLog
+from .profiling import DEFAULT_SCAN_ROWS
+from .reference import REFERENCE_FORMATS, build_reference, export_reference_csv, timestamped_output_path
+from .snapshots import compare_snapshots, header_history, import_reference, list_snapshots
+from .startup import measure_startup
+from .streaming_comparer import DEFAULT_MAX_ROWS_IN_MEMORY, streaming_reference_comparer
+from .watcher import DEFAULT_POLL_SECONDS, watch_directory
+
+# |||||||||||||||||||
+# THE COMMAND LINE
+# |||||||||||||||||||
+
+# Exit codes for the command line, following diff: differences found is 1 and errors are 2
+EXIT_OK = 0
+EXIT_DIFFERENCES_FOUND = 1
+EXIT_ERROR = 2
+
+
+def main(argv=None):
+    """Function to run the app from the command line. With no arguments the window
+    is opened, otherwise the build or compare subcommand is run headlessly and a json
+    summary is printed. Returns the exit code"""
+    parser = argparse.ArgumentParser(description="Build reference files of the csv and xlsx tables in a "
+                                                 "directory, and compare them to find changes. "
+                                                 "Run with no arguments to open the window.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    build_parser = subparsers.add_parser("build", help="Build a reference file from a directory")
+    build_parser.add_argument("directory", help="Directory to build the reference from")
+    build_parser.add_argument("save_folder", help="Folder to save the reference file in")
+    build_parser.add_argument("--scan-rows", type=int, default=DEFAULT_SCAN_ROWS,
+                              help="Rows from the top of each file used to find headers (default %(default)s)")
+    build_parser.add_argument("--full-scan", action="store_true", help="Scan whole files for headers")
+    build_parser.add_argument("--workers", type=int, default=1, help="Processes to profile files with")
+    build_parser.add_argument("--cache", action="store_true", help="Only re-read new or changed files")
+    build_parser.add_argument("--fingerprint", choices=["full", "sampled"], help="Add content fingerprints")
+    build_parser.add_argument("--include", action="append", help="Only include file names matching this glob")
+    build_parser.add_argument("--exclude", action="append", help="Skip file names matching this glob")
+    build_parser.add_argument("--prune", action="append", help="Don't descend into directories matching this glob")
+    build_parser.add_argument("--format", choices=REFERENCE_FORMATS, default="csv",
+                              help="Format to save the reference in, parquet needs pyarrow (default %(default)s)")
+    build_parser.add_argument("--log", help="Write the file access messages to this file")
+    build_parser.add_argument("--metrics", help="Write phase times and per file stats to this file as json lines")
+    build_parser.add_argument("--snapshot-store", help="Also add the reference as a snapshot to this SQLite store")
+    build_parser.add_argument("--max-file-mb", type=float, help="Skip files bigger than this many megabytes")
+    build_parser.add_argument("--max-rows", type=int, help="Skip files with more rows than this")
+    build_parser.add_argument("--column-profile", action="store_true",
+                              help="Add each file's row count and per column nulls, types and lengths, "
+                                   "reading every file in full")
+    build_parser.add_argument("--timeout", type=float, help="Skip files taking longer than this many seconds, "
+                                                            "profiling each in a process that can be stopped")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare an expected and an actual reference file. "
+                                                           "Exits with 1 if differences are found")
+    compare_parser.add_argument("expected", help="Path of reference file to use as the template")
+    compare_parser.add_argument("actual", help="Path of reference file to compare against expected")
+    compare_parser.add_argument("save_folder", help="Folder to save the comparison file in")
+    compare_parser.add_argument("--streaming", action="store_true",
+                                help="Compare without loading the references into memory, for very large references")
+    compare_parser.add_argument("--max-rows-in-memory", type=int, default=DEFAULT_MAX_ROWS_IN_MEMORY,
+                                help="Rows held in memory by each sort in a streaming compare, before spilling "
+                                     "to disk (default %(default)s)")
+    compare_parser.add_argument("--metrics", help="Write the time of each part of the compare to this file as "
+                                                  "json lines")
+
+    watch_parser = subparsers.add_parser("watch", help="Watch a directory and print each difference found as a "
+                                                       "json line, until stopped with Ctrl+C")
+    watch_parser.add_argument("directory", help="Directory to watch")
+    watch_parser.add_argument("--interval", type=float, default=DEFAULT_POLL_SECONDS,
+                              help="Seconds between checks when polling (default %(default)s)")
+    watch_parser.add_argument("--poll", action="store_true", help="Poll stat snapshots even where inotify is available")
+    watch_parser.add_argument("--scan-rows", type=int, default=DEFAULT_SCAN_ROWS,
+                              help="Rows from the top of each file used to find headers (default %(default)s)")
+    watch_parser.add_argument("--full-scan", action="store_true", help="Scan whole files for headers")
+    watch_parser.add_argument("--workers", type=int, default=1, help="Processes to profile files with")
+    watch_parser.add_argument("--fingerprint", choices=["full", "sampled"], help="Also report content changes")
+    watch_parser.add_argument("--include", action="append", help="Only include file names matching this glob")
+    watch_parser.add_argument("--exclude", action="append", help="Skip file names matching this glob")
+    watch_parser.add_argument("--prune", action="append", help="Don't descend into directories matching this glob")
+
+    snapshots_parser = subparsers.add_parser("snapshots", help="List the snapshots in a SQLite snapshot store")
+    snapshots_parser.add_argument("store", help="Path of the snapshot store")
+
+    import_parser = subparsers.add_parser("snapshot-import", help="Add reference files already built to a "
+                                                                  "snapshot store, making it if needed")
+    import_parser.add_argument("store", help="Path of the snapshot store")
+    import_parser.add_argument("references", nargs="+", help="Paths of the reference files, oldest first")
+
+    snapshot_diff_parser = subparsers.add_parser("snapshot-diff", help="Compare two snapshots in a store. "
+                                                                       "Exits with 1 if differences are found")
+    snapshot_diff_parser.add_argument("store", help="Path of the snapshot store")
+    snapshot_diff_parser.add_argument("expected", type=int, help="Id of the snapshot to use as the template")
+    snapshot_diff_parser.add_argument("actual", type=int, help="Id of the snapshot to compare against expected")
+    snapshot_diff_parser.add_argument("save_folder", help="Folder to save the comparison file in")
+
+    history_parser = subparsers.add_parser("header-history", help="List the snapshots where a file's headers "
+                                                                  "changed, the last being when they last changed")
+    history_parser.add_argument("store", help="Path of the snapshot store")
+    history_parser.add_argument("file_path", help="Path of the file, as it appears in the references")
+
+    export_parser = subparsers.add_parser("export-csv", help="Save a copy of a reference file as a csv")
+    export_parser.add_argument("reference", help="Path of the reference file to export")
+    export_parser.add_argument("csv_path", nargs="?", help="Path to save the csv at (default next to the reference)")
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Time the crawler, reference builder and comparer "
+                                                               "on a synthetic tree, saving the results as json")
+    benchmark_parser.add_argument("output", help="Path to save the json results at")
+    for option, option_type, option_help in (("depth", int, "Levels of directories"),
+                                             ("fan_out", int, "Sub directories in each directory"),
+                                             ("files", int, "Files in the whole tree"),
+                                             ("xlsx_share", float, "Fraction of files which are xlsx"),
+                                             ("rows", int, "Data rows in each file"),
+                                             ("columns", int, "Columns in each file"),
+                                             ("header_offset", int, "Title and blank rows above the headers"),
+                                             ("utf16_share", float, "Fraction of csv files saved as UTF-16"),
+                                             ("seed", int, "Seed for the random layout")):
+        benchmark_parser.add_argument("--" + option.replace("_", "-"), type=option_type,
+                                      default=DEFAULT_TREE_OPTIONS[option],
+                                      help=option_help + " (default %(default)s)")
+    benchmark_parser.add_argument("--repeat", type=int, default=3, help="Times to run each phase, keeping the "
+                                                                        "fastest (default %(default)s)")
+    benchmark_parser.add_argument("--scan-rows", type=int, default=DEFAULT_SCAN_ROWS,
+                                  help="Rows from the top of each file used to find headers (default %(default)s)")
+    benchmark_parser.add_argument("--full-scan", action="store_true", help="Scan whole files for headers")
+    benchmark_parser.add_argument("--workers", type=int, default=1, help="Processes to profile files with")
+    benchmark_parser.add_argument("--fingerprint", choices=["full", "sampled"], help="Add content fingerprints")
+    benchmark_parser.add_argument("--format", choices=REFERENCE_FORMATS, default="csv",
+                                  help="Format to save the references in (default %(default)s)")
+    benchmark_parser.add_argument("--work-dir", help="Folder to make the tree in, and keep it (default a temp folder)")
+    benchmark_parser.add_argument("--baseline", help="Results json of an earlier run to compare the wall times with")
+
+    subparsers.add_parser("startup-check", help="Check importing the package and starting the command line "
+                                                "stay within their time budgets. Exits with 2 if not")
+
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        run_gui()
+        return EXIT_OK
+
+    if args.command == "startup-check":
+        startup_summary = measure_startup()
+        print(json.dumps(startup_summary))
+        return EXIT_OK if startup_summary["Within Budget"] else EXIT_ERROR
+
+    try:
+        if args.command == "build":
+            run_log = RunLog(args.metrics)
+            run_summary = build_reference(args.directory, args.save_folder,
+                                          scan_rows=None if args.full_scan else args.scan_rows,
+                                          workers=args.workers,
+                                          use_cache=args.cache,
+                                          fingerprint=args.fingerprint,
+                                          include_globs=args.include,
+                                          exclude_globs=DEFAULT_EXCLUDE_GLOBS if args.exclude is None else args.exclude,
+                                          prune_globs=DEFAULT_PRUNE_GLOBS if args.prune is None else args.prune,
+                                          reference_format=args.format,
+                                          run_log=run_log,
+                                          log_path=args.log,
+                                          snapshot_store=args.snapshot_store,
+                                          max_file_bytes=None if args.max_file_mb is None
+                                          else int(args.max_file_mb * 1024 * 1024),
+                                          max_rows=args.max_rows,
+                                          timeout_seconds=args.timeout,
+                                          column_profile=args.column_profile)
+            run_summary["Metrics"] = run_log.close()
+            print(json.dumps(run_summary))
+            return EXIT_OK
+
+        if args.command == "benchmark":
+            results = run_benchmarks(args.output,
+                                     tree_options={option: getattr(args, option) for option in DEFAULT_TREE_OPTIONS},
+                                     build_options={"scan_rows": None if args.full_scan else args.scan_rows,
+                                                    "workers": args.workers,
+                                                    "fingerprint": args.fingerprint,
+                                                    "reference_format": args.format},
+                                     repeat=args.repeat,
+                                     work_dir=args.work_dir,
+                                     baseline_path=args.baseline)
+            print(json.dumps(results["Phases"]))
+            return EXIT_OK
+
+        if args.command == "watch":
+            try:
+                for differences in watch_directory(args.directory, poll_seconds=args.interval,
+                                                   use_inotify=not args.poll,
+                                                   scan_rows=None if args.full_scan else args.scan_rows,
+                                                   workers=args.workers,
+                                                   fingerprint=args.fingerprint,
+                                                   include_globs=args.include,
+                                                   exclude_globs=DEFAULT_EXCLUDE_GLOBS if args.exclude is None
+                                                   else args.exclude,
+                                                   prune_globs=DEFAULT_PRUNE_GLOBS if args.prune is None
+                                                   else args.prune):
+                    for difference in differences:
+                        print(json.dumps(difference), flush=True)
+            except KeyboardInterrupt:
+                pass
+            return EXIT_OK
+
+        if args.command == "snapshots":
+            print(json.dumps(list_snapshots(args.store)))
+            return EXIT_OK
+
+        if args.command == "snapshot-import":
+            print(json.dumps({"Snapshot IDs": [import_reference(args.store, reference)
+                                               for reference in args.references]}))
+            return EXIT_OK
+
+        if args.command == "header-history":
+            print(json.dumps(header_history(args.store, args.file_path)))
+            return EXIT_OK
+
+        if args.command == "snapshot-diff":
+            comparison_path = timestamped_output_path(args.save_folder, "ComparisonFile")
+            comparison_df = compare_snapshots(args.store, args.expected, args.actual,
+                                              ("FilePath", "Directory", "FileName"))
+            comparison_df.to_csv(comparison_path)
+            print(json.dumps({"Differences Found": len(comparison_df), "Comparison File": comparison_path}))
+            return EXIT_DIFFERENCES_FOUND if len(comparison_df) else EXIT_OK
+
+        if args.command == "export-csv":
+            print(json.dumps({"Csv File": export_reference_csv(args.reference, args.csv_path)}))
+            return EXIT_OK
+
+        comparison_path = timestamped_output_path(args.save_folder, "ComparisonFile")
+        run_log = RunLog(args.metrics)
+        if args.streaming:
+            differences_found = streaming_reference_comparer(args.expected, args.actual,
+                                                             ("FilePath", "Directory", "FileName"), comparison_path,
+                                                             max_rows_in_memory=args.max_rows_in_memory,
+                                                             run_log=run_log)
+        else:
+            comparison_df = reference_comparer(args.expected, args.actual, ("FilePath", "Directory", "FileName"),
+                                               run_log=run_log)
+            with run_log.phase("Compare Write"):
+                comparison_df.to_csv(comparison_path)
+            differences_found = len(comparison_df)
+        print(json.dumps({"Differences Found": differences_found, "Comparison File": comparison_path,
+                          "Metrics": run_log.close()}))
+        return EXIT_DIFFERENCES_FOUND if differences_found else EXIT_OK
+
+    except Exception as e:
+        print(''.join([args.command, " failed | ", repr(e)]), file=sys.stderr)
+        return EXIT_ERROR
+
+
+# Only run when called directly, as python -m table_crawler.cli, since worker processes re-import it
+if __name__ == '__main__':
+    sys.exit(main())
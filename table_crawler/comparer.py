@@ -0,0 +1,336 @@
+import json
+
+from .instrumentation import timed_phase
+from .reference import read_reference
+
+# |||||||||||||||||||
+# Function for comparing two reference files
+# |||||||||||||||||||
+
+# Check sources of the header and content comparisons, see name_check_source for the name checks
+HEADERS_CHECK_SOURCE = "Matched on FilePath - Compared Headers"
+CONTENT_CHECK_SOURCE = "Matched on FilePath - Compared Content Fingerprint"
+PROFILE_CHECK_SOURCE = "Matched on FilePath - Compared Column Profile"
+
+# Shorter names the match types are given in the output
+MATCH_TYPE_NAMES = {'Added in new ref file': 'New', 'Missing in new reference': 'Missing'}
+
+
+def name_check_source(col_name):
+    """Function to get the check source of the name check on a reference column"""
+    return "Matched on " + col_name + " - Compared " + col_name + " Name"
+
+
+def header_positions(headers):
+    """Function to map each header in a list to the column indexes it appears at"""
+    positions = {}
+    for index, header in enumerate(headers):
+        positions.setdefault(header, []).append(index)
+    return positions
+
+
+def header_differences(headers_pre, headers_post):
+    """Function to compare the headers of one file between two references in linear
+    time, using maps of each header's positions rather than searching the lists.
+    Returns a list of (header, match type) pairs for each difference found:
+    - "Added in new ref file" or "Missing in new reference", once per occurrence
+    - "Duplicate" when a header appears more times than before, and more than once
+    - "Moved" when the first column index of a header in both references changed"""
+    positions_pre = header_positions(headers_pre)
+    positions_post = header_positions(headers_post)
+
+    differences = []
+    for header in headers_post:
+        if header not in positions_pre:
+            differences.append((header, "Added in new ref file"))
+
+    for header in headers_pre:
+        if header not in positions_post:
+            differences.append((header, "Missing in new reference"))
+
+    for header, indexes_post in positions_post.items():
+        indexes_pre = positions_pre.get(header)
+        if indexes_pre is None:
+            continue
+        if len(indexes_post) > 1 and len(indexes_post) > len(indexes_pre):
+            differences.append((header, "Duplicate"))
+        if indexes_post[0] != indexes_pre[0]:
+            differences.append((header, "Moved"))
+
+    return differences
+
+
+def profile_differences(profile_pre, profile_post):
+    """Function to compare the column profiles of one file between two references, as
+    read from their json, matching columns on their headers. Columns whose header appears
+    more than once are matched on the first. Returns a list of (header, match type) pairs
+    for each difference found:
+    - "Became empty" when a column with values before has no values in any row now
+    - "Type changed" when the inferred type of a column with values on both sides changed"""
+    columns_pre = {}
+    for column in profile_pre["Columns"]:
+        columns_pre.setdefault(column["Header"], column)
+
+    differences = []
+    headers_seen = set()
+    for column_post in profile_post["Columns"]:
+        header = column_post["Header"]
+        column_pre = columns_pre.get(header)
+        if column_pre is None or header in headers_seen:
+            continue
+        headers_seen.add(header)
+
+        # Nulls aren't known for every format, such as Parquet files without statistics
+        if (None not in (column_pre["Nulls"], column_post["Nulls"]) and profile_post["Rows"]
+                and column_post["Nulls"] == profile_post["Rows"] and column_pre["Nulls"] < profile_pre["Rows"]):
+            differences.append((header, "Became empty"))
+        elif "Empty" not in (column_pre["Type"], column_post["Type"]) and column_pre["Type"] != column_post["Type"]:
+            differences.append((header, "Type changed"))
+
+    return differences
+
+
+def compared_columns(cols_to_check):
+    """Function to get the reference columns a comparison on cols_to_check needs"""
+    return set(cols_to_check) | {"FilePath", "Headers List", "Content Fingerprint", "Column Profile", "Directory",
+                                 "Directory Digest"}
+
+
+def unchanged_rows(pre_df, post_df):
+    """Function to find the rows of two references in directories with the same path and
+    Directory Digest in both, which are identical in every column, so comparisons can pass
+    over them. A digest only covers its directory's own files, so each directory is
+    matched on its own, with one lookup per row of both references rather than skipping
+    whole subtrees. Returns a boolean Series for each reference, all False if either
+    reference was built before digests were added"""
+    import pandas as pd
+
+    if not {"Directory", "Directory Digest"} <= set(pre_df.columns) & set(post_df.columns):
+        return pd.Series(False, index=pre_df.index), pd.Series(False, index=post_df.index)
+
+    # Pairing each row's directory with its digest, without building a joined string per row
+    pre_keys = pd.MultiIndex.from_frame(pre_df[["Directory", "Directory Digest"]].astype(object))
+    post_keys = pd.MultiIndex.from_frame(post_df[["Directory", "Directory Digest"]].astype(object))
+    # Rows without a digest, from a stopped build, never count as unchanged
+    return (pd.Series(pre_keys.isin(post_keys), index=pre_df.index) & pre_df["Directory Digest"].notna(),
+            pd.Series(post_keys.isin(pre_keys), index=post_df.index) & post_df["Directory Digest"].notna())
+
+
+def values_not_in(values, other_values):
+    """Function to keep the values of a column which aren't anywhere in another column.
+    The columns are hashed as plain objects, which is many times faster than hashing
+    pandas' string columns, while the values kept keep their own type"""
+    return values[~values.astype(object).isin(other_values.astype(object))]
+
+
+def reference_comparer(pre_ref, post_ref, cols_to_check, run_log=None):
+    """Returns a  DataFrame showing all changed files and headers within those files
+    does this using two provided reference file paths made with the other functions.
+    The references can be in any of the REFERENCE_FORMATS, and don't need to match.
+    Pass a RunLog as run_log to record how long each part of the comparison takes"""
+
+    # Read in only the reference columns that are compared, to keep memory down
+    needed_cols = compared_columns(cols_to_check)
+    with timed_phase(run_log, "Compare Read"):
+        pre_df = read_reference(pre_ref, needed_cols)
+        post_df = read_reference(post_ref, needed_cols)
+
+    return compare_references(pre_df, post_df, cols_to_check, run_log)
+
+
+def compare_references(pre_df, post_df, cols_to_check, run_log=None):
+    """Returns the DataFrame of differences reference_comparer does, from two references
+    already read into DataFrames, with the Headers List column as lists. Rows in directories
+    whose digests match are only used to check if names are in both references, see
+    unchanged_rows, so the header, profile and content checks only run on the rest"""
+    import pandas as pd
+
+    with timed_phase(run_log, "Compare Digests"):
+        pre_unchanged, post_unchanged = unchanged_rows(pre_df, post_df)
+        pre_changed_df = pre_df[~pre_unchanged]
+        post_changed_df = post_df[~post_unchanged]
+
+    def same_miss_add(col_name):
+        """Function to check a column in the dataframe for differences and additions.
+        Works in one pass over hashed sets of each side's values, rather than joining
+        the whole references. Values in both references aren't differences, so they
+        aren't returned, which includes every value in an unchanged directory"""
+
+        col_name_source_name = name_check_source(col_name)
+
+        # Keeping every row, including repeated values, in the order of its reference
+        missing_values = values_not_in(pre_changed_df[col_name], post_df[col_name])
+        added_values = values_not_in(post_changed_df[col_name], pre_df[col_name])
+
+        concat_results = pd.DataFrame({"Value": pd.concat([missing_values, added_values], ignore_index=True),
+                                       "Match Type": (["Missing in new reference"] * len(missing_values)
+                                                      + ["Added in new ref file"] * len(added_values)),
+                                       "Check Source": col_name_source_name})
+
+        return concat_results
+
+    # |||||||||||||||||||||
+    # ||| Running name checks functions |||
+    # |||||||||||||||||||||
+
+    # Initialise the list of DataFrames to concat
+    name_checks_list = []
+
+    with timed_phase(run_log, "Compare Names"):
+        # Perform the reference checking actions for each column provided
+        for x in cols_to_check:
+            name_checks_list.append(same_miss_add(x))
+
+    # Concat them all together
+    multi_concat = pd.concat(name_checks_list)
+
+    # Sorting on Check Source and then Match Type
+    multi_concat_sorted = multi_concat.sort_values(["Check Source", "Match Type"])
+
+    # Defining final output variable
+    path_compare_final = multi_concat_sorted
+
+    # |||||||||||||||||||||
+    # ||| Header Difference Detection|||
+    # |||||||||||||||||||||
+
+    with timed_phase(run_log, "Compare Headers"):
+        # Subsetting the pre and post reference files and then merging on FilePath
+        headers_to_select = ["FilePath", 'Headers List']
+
+        # A file in an unchanged directory is unchanged on both sides, so only the rest are merged
+        pre_subset = pre_changed_df[headers_to_select]
+        post_subset = post_changed_df[headers_to_select]
+
+        pre_post_merge = pre_subset.merge(post_subset, on="FilePath", how='inner',
+                                          suffixes=('_pre', '_post'))
+
+        # Converting Dataframes to a Dictionary of lists for comparison work
+        comparison_dict = pre_post_merge.to_dict(orient='list')
+
+        # Taking out the lists from the dictionary as just lists for ease of use
+        headers_pre_list_list = comparison_dict['Headers List_pre']
+        headers_post_list_list = comparison_dict['Headers List_post']
+
+        # Looping through dictionary to compare differences and adding results to dict
+
+        # Defining dictionary to capture results with
+        col_diff_dict = {'Header Value': [],
+                         'Match Type': [],
+                         'Check Source': [],
+                         'Index': []}
+
+        # Checking between the lists, matching header lists using the enumerate index
+        # Adding index to dictionary for merging with source data later
+        for index, (headers_pre, headers_post) in enumerate(zip(headers_pre_list_list, headers_post_list_list)):
+            for header, match in header_differences(headers_pre, headers_post):
+                col_diff_dict['Header Value'].append(header)
+                col_diff_dict['Match Type'].append(match)
+                col_diff_dict['Check Source'].append(HEADERS_CHECK_SOURCE)
+                col_diff_dict['Index'].append(index)
+
+        # Converting the results into a DataFrame
+        headers_differences_df = pd.DataFrame(col_diff_dict).set_index("Index")
+
+        # Joining that table back with the source table to get the paths of the source match
+        # Using index numbers to join since they are the same
+        headers_diff_full = pd.merge(headers_differences_df,
+                                     pre_post_merge,
+                                     left_index=True,
+                                     right_index=True,
+                                     how='left')
+
+        # Subsetting to drop unwanted columns
+        cols_to_subset = ["Header Value", "Match Type", "Check Source", "FilePath"]
+        headers_diff_full_subset = headers_diff_full[cols_to_subset]
+
+        # Sorting by FilePath then Match Type
+        headers_diff_full_sorted = headers_diff_full_subset.sort_values(["FilePath", "Match Type"])
+
+        # Renaming FilePath column name
+        headers_diff_full_sorted.rename(columns={'FilePath': 'Value'}, inplace=True)
+
+        # Defining final output variable
+        headers_diff_final = headers_diff_full_sorted
+
+    # |||||||||||||||||||||
+    # ||| Column Profile Drift Detection|||
+    # |||||||||||||||||||||
+
+    with timed_phase(run_log, "Compare Profiles"):
+        # Only possible for files profiled with column profiles in both references
+        profile_diff_list = []
+        if "Column Profile" in pre_df.columns and "Column Profile" in post_df.columns:
+            profiles_to_select = ["FilePath", "Column Profile"]
+            profile_merge = pre_changed_df[profiles_to_select].merge(post_changed_df[profiles_to_select],
+                                                                     on="FilePath", how='inner',
+                                                                     suffixes=('_pre', '_post')).dropna()
+
+            profile_diff_dict = {'Value': [],
+                                 'Match Type': [],
+                                 'Check Source': [],
+                                 'Header Value': []}
+            for file_path, profile_pre, profile_post in zip(profile_merge["FilePath"],
+                                                            profile_merge["Column Profile_pre"],
+                                                            profile_merge["Column Profile_post"]):
+                for header, match in profile_differences(json.loads(profile_pre), json.loads(profile_post)):
+                    profile_diff_dict['Value'].append(file_path)
+                    profile_diff_dict['Match Type'].append(match)
+                    profile_diff_dict['Check Source'].append(PROFILE_CHECK_SOURCE)
+                    profile_diff_dict['Header Value'].append(header)
+
+            # Sorted like the header differences, by FilePath then Match Type
+            if profile_diff_dict['Value']:
+                profile_diff_list.append(pd.DataFrame(profile_diff_dict).sort_values(["Value", "Match Type"]))
+
+    # |||||||||||||||||||||
+    # ||| Content Change Detection|||
+    # |||||||||||||||||||||
+
+    with timed_phase(run_log, "Compare Content"):
+        # Only possible if both references were built with fingerprints
+        content_diff_list = []
+        if "Content Fingerprint" in pre_df.columns and "Content Fingerprint" in post_df.columns:
+            fingerprints_to_select = ["FilePath", "Content Fingerprint"]
+            fingerprint_merge = pre_changed_df[fingerprints_to_select].merge(post_changed_df[fingerprints_to_select],
+                                                                             on="FilePath", how='inner',
+                                                                             suffixes=('_pre', '_post')).dropna()
+
+            # Fingerprints of different types can't be compared, so checking the type prefix matches
+            pre_fingerprints = fingerprint_merge["Content Fingerprint_pre"].astype(str)
+            post_fingerprints = fingerprint_merge["Content Fingerprint_post"].astype(str)
+            same_type_bool = pre_fingerprints.str.split(":").str[0] == post_fingerprints.str.split(":").str[0]
+            changed_bool = same_type_bool & (pre_fingerprints != post_fingerprints)
+
+            content_diff = fingerprint_merge.loc[changed_bool, ["FilePath"]].rename(columns={'FilePath': 'Value'})
+            content_diff["Match Type"] = "Content changed"
+            content_diff["Check Source"] = CONTENT_CHECK_SOURCE
+            content_diff_list.append(content_diff)
+
+    # |||||||||||||||||||||
+    # ||| Combining with file cross check results|||
+    # |||||||||||||||||||||
+
+    # Concatenating them together
+    compare_output_final = pd.concat([path_compare_final, headers_diff_final] + profile_diff_list + content_diff_list)
+
+    # Removing rows where no difference was found
+    compare_output_final_diffs_only = compare_output_final[compare_output_final['Match Type'] != "In both references"]
+
+    # Using a copy to avoid the SettingWithCopyWarning
+    compare_output_final_diffs_only = compare_output_final_diffs_only.copy()
+
+    # Renaming Match Type Values
+    compare_output_final_diffs_only['Match Type'] = compare_output_final_diffs_only['Match Type'].replace(
+        MATCH_TYPE_NAMES)
+
+    # Sorting results
+    compare_output_final_diffs_only_sorted = compare_output_final_diffs_only.sort_values(["Check Source", "Match Type"])
+
+    # Resetting Index
+    compare_output_final_diffs_only_sorted.reset_index(drop=True, inplace=True)
+
+    # Defining final output
+    all_diffs_final = compare_output_final_diffs_only_sorted
+
+    return all_diffs_final
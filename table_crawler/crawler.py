@@ -0,0 +1,127 @@
+import fnmatch
+import os
+
+# |||||||||||||||||||
+# DIRECTORY CRAWLER
+# |||||||||||||||||||
+
+# File name patterns skipped by default when crawling, such as Office lock files,
+# and directory name patterns which aren't descended into at all
+DEFAULT_EXCLUDE_GLOBS = ("~$*",)
+DEFAULT_PRUNE_GLOBS = (".git", ".svn", "__pycache__")
+
+
+def matches_any(name, globs):
+    """Function to check if a file or directory name matches any of a list of glob patterns"""
+    return any(fnmatch.fnmatch(name, glob) for glob in globs)
+
+
+def scan_directory(directory, file_types=None, include_globs=None, exclude_globs=DEFAULT_EXCLUDE_GLOBS,
+                   prune_globs=DEFAULT_PRUNE_GLOBS, crawl_summary=None):
+    """Function to list the files and sub directories directly inside one directory,
+    with the crawl_files filters applied. Returns a list of (file path, file name,
+    file type, size, modified time) for the files, and a list of the sub directory
+    paths to walk. Entries visited and skipped are counted in crawl_summary if given.
+    Raises OSError if the directory can't be read"""
+    if crawl_summary is None:
+        crawl_summary = {"Entries Visited": 0, "Entries Skipped": 0}
+
+    files = []
+    sub_directories = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            crawl_summary["Entries Visited"] += 1
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                # Like os.walk, symlinked directories aren't followed
+                if entry.is_symlink() or matches_any(entry.name, prune_globs):
+                    crawl_summary["Entries Skipped"] += 1
+                else:
+                    sub_directories.append(entry.path)
+                continue
+
+            file_name, file_type = os.path.splitext(entry.name)
+            if ((file_types is not None and file_type.lower() not in file_types)
+                    or (include_globs and not matches_any(entry.name, include_globs))
+                    or matches_any(entry.name, exclude_globs)):
+                crawl_summary["Entries Skipped"] += 1
+                continue
+
+            try:
+                stat_result = entry.stat()
+                file_size, modified_time = stat_result.st_size, stat_result.st_mtime_ns
+            except OSError:
+                file_size, modified_time = None, None
+
+            files.append((entry.path, file_name, file_type, file_size, modified_time))
+    return files, sub_directories
+
+
+def walk_directory(directory, file_types=None, include_globs=None, exclude_globs=DEFAULT_EXCLUDE_GLOBS,
+                   prune_globs=DEFAULT_PRUNE_GLOBS, crawl_summary=None):
+    """Generator that walks a directory tree with scan_directory in the same order as
+    os.walk, yielding (directory, files, sub directories) for each directory reached.
+    Like os.walk, directories which can't be read are passed over"""
+    # Directories still to walk, kept in reverse so they're popped in os.walk order
+    directories_to_walk = [directory]
+    while directories_to_walk:
+        current_directory = directories_to_walk.pop()
+        try:
+            files, sub_directories = scan_directory(current_directory, file_types, include_globs, exclude_globs,
+                                                    prune_globs, crawl_summary)
+        except OSError:
+            continue
+        yield current_directory, files, sub_directories
+        directories_to_walk.extend(reversed(sub_directories))
+
+
+def crawl_files(directory, file_types=None, include_globs=None, exclude_globs=DEFAULT_EXCLUDE_GLOBS,
+                prune_globs=DEFAULT_PRUNE_GLOBS):
+    """Function to create DataFrame with all file paths, names, types, directories,
+    sizes and modified times in one table, from a specified directory. Walks with
+    os.scandir in the same order as os.walk, filtering while it goes:
+    - file_types limits files to those lower case extensions, matched in any case, None keeps every type
+    - include_globs, if given, keeps only file names matching one of them
+    - exclude_globs drops file names matching any of them
+    - prune_globs stops directories matching any of them being descended into
+    Sizes and modified times come from the DirEntry, which already has them on Windows.
+    Also returns a dictionary counting the entries visited and skipped"""
+    import pandas as pd
+
+    dict_of_lists = {"FilePath": [],
+                     "Directory": [],
+                     "FileName": [],
+                     "FileType": [],
+                     "FileSize": [],
+                     "ModifiedTimeNs": []}
+    crawl_summary = {"Entries Visited": 0,
+                     "Entries Skipped": 0}
+
+    for current_directory, files, sub_directories in walk_directory(directory, file_types, include_globs,
+                                                                    exclude_globs, prune_globs, crawl_summary):
+        for file_path, file_name, file_type, file_size, modified_time in files:
+            dict_of_lists["FilePath"].append(file_path)
+            dict_of_lists["Directory"].append(current_directory)
+            dict_of_lists["FileName"].append(file_name)
+            dict_of_lists["FileType"].append(file_type)
+            dict_of_lists["FileSize"].append(file_size)
+            dict_of_lists["ModifiedTimeNs"].append(modified_time)
+
+    # Nullable integers keep nanosecond times exact when a file couldn't be read
+    dict_of_lists["FileSize"] = pd.array(dict_of_lists["FileSize"], dtype="Int64")
+    dict_of_lists["ModifiedTimeNs"] = pd.array(dict_of_lists["ModifiedTimeNs"], dtype="Int64")
+
+    combined_df = pd.DataFrame(dict_of_lists)
+    return combined_df, crawl_summary
+
+
+def all_files(directory):
+    """Function to create DataFrame with all file paths,
+    names, types and directories in one table,
+    from a specified directory"""
+    combined_df, crawl_summary = crawl_files(directory, exclude_globs=(), prune_globs=())
+    return combined_df.drop(columns=["FileSize", "ModifiedTimeNs"])
@@ -0,0 +1,462 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from .comparer import reference_comparer
+from .instrumentation import RunLog
+from .profiling import DEFAULT_SCAN_ROWS, message_list
+from .reference import build_reference, clear_reference_cache, timestamped_output_path
+from .snapshots import SNAPSHOT_STORE_NAME
+from .streaming_comparer import streaming_reference_comparer
+
+# |||||||||||||||||||||||||||
+# Function to format timedelta
+# |||||||||||||||||||||||||||
+
+# Notes from the template I copied for reference
+"""
+    Demo Combo File Chooser - with clearable history
+
+    This is a design pattern that is very useful for programs that you run often that requires
+    a filename be entered.  You've got 4 options to use to get your filename with this pattern:
+    1. Copy and paste a filename into the combo element
+    2. Use the last used item which will be visible when you create the window
+    3. Choose an item from the list of previously used items
+    4. Browse for a new name
+
+    To clear the list of previous entries, click the "Clear History" button.
+
+    The history is stored in a json file using the PySimpleGUI User Settings APIs
+
+    The code is as sparse as possible to enable easy integration into your code.
+
+    Copyright 2021 PySimpleGUI
+"""
+
+def human_delta(tdelta):
+    """
+    Takes a timedelta object and formats it for humans.
+    Usage:
+        # 149 day(s) 8 hr(s) 36 min 19 sec
+        print human_delta(datetime(2014, 3, 30) - datetime.now())
+    Example Results:
+        23 sec
+        12 min 45 sec
+        1 hr(s) 11 min 2 sec
+        3 day(s) 13 hr(s) 56 min 34 sec
+    :param tdelta: The timedelta object.
+    :return: The human formatted timedelta
+    """
+    d = dict(days=tdelta.days)
+    d['hrs'], rem = divmod(tdelta.seconds, 3600)
+    d['min'], d['sec'] = divmod(rem, 60)
+
+    if d['min'] == 0:
+        fmt = '{sec} sec'
+    elif d['hrs'] == 0:
+        fmt = '{min} min {sec} sec'
+    elif d['days'] == 0:
+        fmt = '{hrs} hr(s) {min} min {sec} sec'
+    else:
+        fmt = '{days} day(s) {hrs} hr(s) {min} min {sec} sec'
+
+    return fmt.format(**d)
+
+
+# |||||||||||||||||||
+# THE UI VIA PYSIMPLEGUI
+# |||||||||||||||||||
+
+
+def build_reference_task(window, target_dir, save_folder, cancel_event, **build_options):
+    """Function to build a reference on a worker thread, so the window stays responsive.
+    Progress and the result are sent back to the window as events. Every file access
+    message goes to a log file next to the reference, and the latest ones, with the phase
+    times and slowest files, are kept in message_list for the clipboard"""
+    try:
+        run_log = RunLog()
+        run_summary = build_reference(target_dir, save_folder, **build_options,
+                                      progress_callback=lambda progress: window.write_event_value(
+                                          '-BUILD_PROGRESS-', progress),
+                                      cancel_event=cancel_event, run_log=run_log,
+                                      log_path=timestamped_output_path(save_folder, "ReferenceLog", ".log"))
+        run_log.close()
+        window.write_event_value('-BUILD_DONE-', run_summary)
+    except Exception as e:
+        window.write_event_value('-TASK_ERROR-', ''.join(["Reference file build failed | ", repr(e)]))
+
+
+def comparison_task(window, expected_file_path, actual_file_path, comparison_save_path, cancel_event,
+                    streaming=False):
+    """Function to build a comparison file on a worker thread, so the window stays responsive.
+    The comparison can't be stopped part way, so a cancel just skips writing the output.
+    With streaming the references aren't loaded into memory, and as the output is written
+    as the comparison goes it's always finished"""
+    try:
+        if streaming:
+            streaming_reference_comparer(expected_file_path, actual_file_path, ("FilePath", "Directory", "FileName"),
+                                         timestamped_output_path(comparison_save_path, "ComparisonFile"))
+            window.write_event_value('-COMPARE_DONE-', False)
+            return
+
+        # Build the comparison DataFrame
+        comparison_df = reference_comparer(expected_file_path, actual_file_path, ("FilePath", "Directory", "FileName"))
+
+        # Write the DataFrame as a csv to the specified location
+        if not cancel_event.is_set():
+            comparison_df.to_csv(timestamped_output_path(comparison_save_path, "ComparisonFile"))
+        window.write_event_value('-COMPARE_DONE-', cancel_event.is_set())
+    except Exception as e:
+        window.write_event_value('-TASK_ERROR-', ''.join(["Comparison file build failed | ", repr(e)]))
+
+
+def set_task_buttons_disabled(window, disabled):
+    """Function to stop new tasks being started while one is running"""
+    for button in ('Build Reference File', 'Build Comparison File', 'Clear Reference Cache'):
+        window[button].update(disabled=disabled)
+
+
+def format_progress(progress):
+    """Function to format a build progress event for the status line"""
+    progress_parts = ["{} of {} files".format(progress["Files Done"], progress["Files Total"])]
+    if progress["ETA Seconds"] is not None:
+        progress_parts.append("{:.1f} files/sec".format(progress["Files Per Second"]))
+        progress_parts.append("ETA " + human_delta(timedelta(seconds=round(progress["ETA Seconds"]))))
+    if progress["Current File"] is not None:
+        progress_parts.append(os.path.basename(progress["Current File"]))
+    return " | ".join(progress_parts)
+
+
+def run_gui():
+    """Function to open the window and run it until it's closed. PySimpleGUI and
+    pyperclip are only imported here, so command line runs never need a display"""
+    import PySimpleGUI as sg
+    import pyperclip
+
+    # |||||||||||||||||||||||||||
+    # DEFINING THE LAYOUT
+    # |||||||||||||||||||||||||||
+
+    layout = [
+        # Row 1-2
+        # Saved path ref = -dir_path-
+        # Last File Name = '-last_dir_name-'
+        # Clear History = Clear Dir History
+        # Key = -DIR_PATH_FILE-
+        [sg.Text("DIRECTORY PATH - Build the reference from here")],
+
+        [sg.Combo(sorted(sg.user_settings_get_entry('-dir_path-', [])),
+                  default_value=sg.user_settings_get_entry('-last_dir_name-', ''), size=(175, 1), key='-DIR_PATH_FILE-'),
+         sg.FolderBrowse(), sg.B('Clear Dir History')],
+
+        # Row 3-4
+        # Saved path ref = -ref_output-
+        # Last File Name = '-last_ref_output_name-'
+        # Clear History = Clear Ref Output History
+        # Key = -REF_OUTPUT_PATH_FILE-
+        [sg.Text("REFERENCE OUTPUT LOCATION - Save the reference file here")],
+
+        [sg.Combo(sorted(sg.user_settings_get_entry('-ref_output-', [])),
+                  default_value=sg.user_settings_get_entry('-last_ref_output_name-', ''), size=(175, 1),
+                  key='-REF_OUTPUT_PATH_FILE-'),
+         sg.FolderBrowse(), sg.B('Clear Ref Output History')],
+
+        # Row 5-6
+        # Saved path ref = -expected_ref_path-
+        # Last File Name = '-last_expected_ref_name-'
+        # Clear History = Clear Expected Ref History
+        # Key = -EXPECTED_REF_PATH_FILE-
+        [sg.Text("EXPECTED - Path of reference file to use as the template")],
+
+        [sg.Combo(sorted(sg.user_settings_get_entry('-expected_ref_path-', [])),
+                  default_value=sg.user_settings_get_entry('-last_expected_ref_name-', ''), size=(175, 1),
+                  key='-EXPECTED_REF_PATH_FILE-'),
+         sg.FileBrowse(), sg.B('Clear Expected Ref History')],
+
+        # Row 7-8
+        # Saved path ref = -actual_ref_path-
+        # Last File Name = '-last_actual_ref_name-'
+        # Clear History = Clear Actual Ref History
+        # Key = -ACTUAL_REF_PATH_FILE-
+        [sg.Text("ACTUAL - Path of reference file to compare against expected")],
+
+        [sg.Combo(sorted(sg.user_settings_get_entry('-actual_ref_path-', [])),
+                  default_value=sg.user_settings_get_entry('-last_actual_ref_name-', ''), size=(175, 1),
+                  key='-ACTUAL_REF_PATH_FILE-'),
+         sg.FileBrowse(), sg.B('Clear Actual Ref History')],
+
+        # Row 9-10
+        # Saved path ref = -comparison_path-
+        # Last File Name = '-last_comparison_name-'
+        # Clear History = Clear Comparison History
+        # Key = -COMPARISON_PATH_FILE-
+        [sg.Text("COMPARISON OUTPUT LOCATION - Save the comparison file here")],
+
+        [sg.Combo(sorted(sg.user_settings_get_entry('-comparison_path-', [])),
+                  default_value=sg.user_settings_get_entry('-last_comparison_name-', ''), size=(175, 1),
+                  key='-COMPARISON_PATH_FILE-'),
+         sg.FolderBrowse(), sg.B('Clear Comparison History')],
+
+        # Row 11
+        [sg.HorizontalSeparator()],
+
+        # Row 12
+        [sg.Text('Awaiting Input', font=('Helvetica', 20), text_color='green', background_color='white', key='-STATUS-'),
+         sg.Text("Script run time will appear here", key='-RUNTIME-'),
+         sg.Text("Output dialogue not yet available", text_color='orange', key='-OUTPUTDIALOGUE-')],
+
+        # Row 13
+        [sg.Button('Build Reference File'),
+         sg.Button('Build Comparison File'),
+         sg.Button('Copy Output Dialogue to Clipboard'),
+         sg.Button('Save History'),
+         sg.Button('Exit & Save History'),
+         sg.Button('Cancel'),
+         sg.VerticalSeparator()],
+
+        # Row 14
+        [sg.Checkbox('Full Header Scan', default=False, key='-FULL_SCAN-',
+                     tooltip='Scan whole files for headers instead of only the top rows'),
+         sg.Text('Worker Processes'),
+         sg.Spin(list(range(1, (os.cpu_count() or 1) + 1)), initial_value=1, size=(3, 1), key='-WORKERS-',
+                 tooltip='Profile this many files at once in separate processes'),
+         sg.Checkbox('Use Reference Cache', default=True, key='-USE_CACHE-',
+                     tooltip='Only re-read files which are new or changed since the last build'),
+         sg.Button('Clear Reference Cache'),
+         sg.Text('Content Fingerprint'),
+         sg.Combo(['None', 'Sampled', 'Full'], default_value='None', readonly=True, key='-FINGERPRINT-',
+                  tooltip='Sampled hashes the start and end of each file, Full hashes every byte'),
+         sg.Text('Reference Format'),
+         sg.Combo(['CSV', 'Parquet'], default_value='CSV', readonly=True, key='-REF_FORMAT-',
+                  tooltip='Parquet loads much faster for comparisons but needs pyarrow, CSV is readable'),
+         sg.Checkbox('Low Memory Comparison', default=False, key='-STREAMING_COMPARE-',
+                     tooltip='Compare very large references by sorting them on disk instead of in memory'),
+         sg.Checkbox('Save Snapshot History', default=False, key='-SNAPSHOT_HISTORY-',
+                     tooltip='Also add each reference to ' + SNAPSHOT_STORE_NAME + ' in the reference folder, '
+                             'for diffing any two runs later'),
+         sg.Checkbox('Column Profile', default=False, key='-COLUMN_PROFILE-',
+                     tooltip='Record the nulls, types and lengths of each column, so a column going empty '
+                             'or changing type is reported. Reads every file in full'),
+         sg.Text('File Timeout'),
+         sg.Combo(['None', '10', '30', '60', '300'], default_value='None', readonly=True, key='-FILE_TIMEOUT-',
+                  tooltip='Skip files taking longer than this many seconds, marking them in the reference')]
+
+    ]
+
+    # |||||||||||||||||||||||||||
+    # RUNNING THE WINDOW
+    # |||||||||||||||||||||||||||
+
+    def save_all_histories():
+        """Function to save all histories so I can repeat it elsewhere"""
+        # If Exit & Save, then need to add the filename to the list of files and also set as the last used filename
+
+        # Dir Path Saves
+        sg.user_settings_set_entry('-dir_path-',
+                                   list(set(sg.user_settings_get_entry('-dir_path-', []) + [
+                                       values['-DIR_PATH_FILE-'], ])))
+        sg.user_settings_set_entry('-last_dir_name-', values['-DIR_PATH_FILE-'])
+
+        # Ref Output Saves
+        sg.user_settings_set_entry('-ref_output-',
+                                   list(set(sg.user_settings_get_entry('-ref_output-', []) + [
+                                       values['-REF_OUTPUT_PATH_FILE-'], ])))
+        sg.user_settings_set_entry('-last_ref_output_name-', values['-REF_OUTPUT_PATH_FILE-'])
+
+        # Expected Ref Template Saves
+        sg.user_settings_set_entry('-expected_ref_path-',
+                                   list(set(sg.user_settings_get_entry('-expected_ref_path-', []) + [
+                                       values['-EXPECTED_REF_PATH_FILE-'], ])))
+        sg.user_settings_set_entry('-last_expected_ref_name-', values['-EXPECTED_REF_PATH_FILE-'])
+
+        # Actual Ref Template Saves
+        sg.user_settings_set_entry('-actual_ref_path-',
+                                   list(set(sg.user_settings_get_entry('-actual_ref_path-', []) + [
+                                       values['-ACTUAL_REF_PATH_FILE-'], ])))
+        sg.user_settings_set_entry('-last_actual_ref_name-', values['-ACTUAL_REF_PATH_FILE-'])
+
+        # Comparison Path Saves
+        sg.user_settings_set_entry('-comparison_path-',
+                                   list(set(sg.user_settings_get_entry('-comparison_path-', []) + [
+                                       values['-COMPARISON_PATH_FILE-'], ])))
+        sg.user_settings_set_entry('-last_comparison_name-', values['-COMPARISON_PATH_FILE-'])
+
+    window = sg.Window('Directory Spreadsheet Change Checker', layout)
+
+    # Set while a task is running on a worker thread, so Cancel can stop it
+    cancel_event = None
+
+    while True:
+        event, values = window.read()
+
+        if event == 'Cancel' and cancel_event is not None:
+            cancel_event.set()
+            window['-STATUS-'].update(value='CANCELLING', text_color='red')
+            continue
+
+        if event in (sg.WIN_CLOSED, 'Cancel'):
+            if cancel_event is not None:
+                cancel_event.set()
+            break
+
+        if event == 'Save History':
+            save_all_histories()
+
+        if event == 'Exit & Save History':
+            save_all_histories()
+            break
+
+        # Clear buttons
+
+        elif event == 'Clear Dir History':
+            sg.user_settings_set_entry('-dir_path-', [])
+            sg.user_settings_set_entry('-last_dir_name-', '')
+            window['-DIR_PATH_FILE-'].update(values=[], value='')
+
+        elif event == 'Clear Ref Output History':
+            sg.user_settings_set_entry('-ref_output-', [])
+            sg.user_settings_set_entry('-last_ref_output_name-', '')
+            window['-REF_OUTPUT_PATH_FILE-'].update(values=[], value='')
+
+        elif event == 'Clear Expected Ref History':
+            sg.user_settings_set_entry('-expected_ref_path-', [])
+            sg.user_settings_set_entry('-last_expected_ref_name-', '')
+            window['-EXPECTED_REF_PATH_FILE-'].update(values=[], value='')
+
+        elif event == 'Clear Actual Ref History':
+            sg.user_settings_set_entry('-actual_ref_path-', [])
+            sg.user_settings_set_entry('-last_actual_ref_name-', '')
+            window['-ACTUAL_REF_PATH_FILE-'].update(values=[], value='')
+
+        elif event == 'Clear Comparison History':
+            sg.user_settings_set_entry('-comparison_path-', [])
+            sg.user_settings_set_entry('-last_comparison_name-', '')
+            window['-COMPARISON_PATH_FILE-'].update(values=[], value='')
+
+        elif event == 'Clear Reference Cache':
+            clear_reference_cache(values['-REF_OUTPUT_PATH_FILE-'])
+
+        # Buttons that perform actions
+
+        elif event == 'Build Reference File':
+
+            startTime = datetime.now()
+
+            window['-STATUS-'].update(value='BUILDING REFERENCE FILE', text_color='red')
+            window.refresh()
+
+            # ||| Run Function BELOW here |||
+
+            save_all_histories()
+
+            # Variables from input
+            directory_path = values["-DIR_PATH_FILE-"]
+            ref_save_loc = values["-REF_OUTPUT_PATH_FILE-"]
+
+            scan_rows = None if values["-FULL_SCAN-"] else DEFAULT_SCAN_ROWS
+            workers = int(values["-WORKERS-"])
+            fingerprint = None if values["-FINGERPRINT-"] == 'None' else values["-FINGERPRINT-"].lower()
+            use_cache = values["-USE_CACHE-"]
+            reference_format = values["-REF_FORMAT-"].lower()
+            snapshot_store = os.path.join(ref_save_loc, SNAPSHOT_STORE_NAME) if values["-SNAPSHOT_HISTORY-"] else None
+            timeout_seconds = None if values["-FILE_TIMEOUT-"] == 'None' else float(values["-FILE_TIMEOUT-"])
+            column_profile = values["-COLUMN_PROFILE-"]
+
+            # Building the reference file and saving it on a worker thread
+            cancel_event = threading.Event()
+            set_task_buttons_disabled(window, True)
+            threading.Thread(target=build_reference_task,
+                             args=(window, directory_path, ref_save_loc, cancel_event),
+                             kwargs={"scan_rows": scan_rows, "workers": workers, "use_cache": use_cache,
+                                     "fingerprint": fingerprint, "reference_format": reference_format,
+                                     "snapshot_store": snapshot_store, "timeout_seconds": timeout_seconds,
+                                     "column_profile": column_profile},
+                             daemon=True).start()
+
+        elif event == '-BUILD_PROGRESS-':
+            if not cancel_event.is_set():
+                progress = values[event]
+                window['-STATUS-'].update(value='BUILDING REFERENCE FILE', text_color='red')
+                window['-RUNTIME-'].update(value=format_progress(progress))
+
+        elif event == '-BUILD_DONE-':
+            run_summary = values[event]
+            cancel_event = None
+            set_task_buttons_disabled(window, False)
+
+            # Copying output dialogue to clip board
+            pyperclip.copy('\n'.join(message_list))
+
+            # Updating Output Dialogue
+            window['-OUTPUTDIALOGUE-'].update(value="Output dialogue available")
+
+            # ||| Run Function ABOVE here |||
+
+            endTime = datetime.now() - startTime
+            endTime_formatted = human_delta(endTime)
+            if run_summary["Cancelled"]:
+                endTime = "Reference file build cancelled, partial reference saved after " + endTime_formatted
+            else:
+                endTime = "Reference file build task complete in " + endTime_formatted
+            if use_cache:
+                endTime += " | Cache hits: {} | Cache misses: {}".format(run_summary["Cache Hits"],
+                                                                       run_summary["Cache Misses"])
+
+            window['-STATUS-'].update(value='IDLE', text_color='green')
+            window['-RUNTIME-'].update(value=endTime)
+
+            window.refresh()
+
+        elif event == 'Build Comparison File':
+
+            startTime = datetime.now()
+
+            window['-STATUS-'].update(value='BUILDING COMPARISON FILE', text_color='red')
+            window.refresh()
+
+            # ||| Run Function BELOW here |||
+
+            save_all_histories()
+
+            # Variables from input
+            expected_file_path = values["-EXPECTED_REF_PATH_FILE-"]
+            actual_file_path = values["-ACTUAL_REF_PATH_FILE-"]
+            comparison_save_path = values["-COMPARISON_PATH_FILE-"]
+            streaming = values["-STREAMING_COMPARE-"]
+
+            # Building the comparison file and saving it on a worker thread
+            cancel_event = threading.Event()
+            set_task_buttons_disabled(window, True)
+            threading.Thread(target=comparison_task,
+                             args=(window, expected_file_path, actual_file_path, comparison_save_path, cancel_event),
+                             kwargs={"streaming": streaming},
+                             daemon=True).start()
+
+        elif event == '-COMPARE_DONE-':
+            cancel_event = None
+            set_task_buttons_disabled(window, False)
+
+            # ||| Run Function ABOVE here |||
+
+            endTime = datetime.now() - startTime
+            endTime_formatted = human_delta(endTime)
+            if values[event]:
+                endTime = "Comparison file build cancelled after " + endTime_formatted
+            else:
+                endTime = "Comparison file build task complete in " + endTime_formatted
+
+            window['-STATUS-'].update(value='IDLE', text_color='green')
+            window['-RUNTIME-'].update(value=endTime)
+
+            window.refresh()
+
+        elif event == '-TASK_ERROR-':
+            cancel_event = None
+            set_task_buttons_disabled(window, False)
+
+            window['-STATUS-'].update(value='ERROR', text_color='red')
+            window['-RUNTIME-'].update(value=values[event])
+
+            window.refresh()
+
+    window.close()
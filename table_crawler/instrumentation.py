@@ -0,0 +1,152 @@
+import heapq
+import json
+import math
+import time
+from contextlib import contextmanager, nullcontext
+
+# |||||||||||||||||||
+# RUN INSTRUMENTATION
+# |||||||||||||||||||
+
+# How many of the slowest files are listed in a run summary
+SLOWEST_FILES_SHOWN = 10
+
+# Smallest duration a latency histogram tells apart, and how much wider each bucket is than
+# the last, so quantiles are within 5% of the true value
+LATENCY_MIN_SECONDS = 1e-6
+LATENCY_BUCKET_GROWTH = 1.05
+
+# Quantiles reported for file durations, by the name they're reported under
+LATENCY_QUANTILES = (("P50", 0.5), ("P90", 0.9), ("P99", 0.99))
+
+
+class LatencyHistogram:
+    """Counts durations in buckets that grow by LATENCY_BUCKET_GROWTH, so quantiles of any
+    number of durations can be given from a few hundred counts at most"""
+
+    def __init__(self):
+        self.bucket_counts = {}
+        self.count = 0
+        self.max_seconds = None
+
+    def add(self, seconds):
+        """Counts one duration"""
+        bucket = 0 if seconds <= LATENCY_MIN_SECONDS else \
+            math.ceil(math.log(seconds / LATENCY_MIN_SECONDS, LATENCY_BUCKET_GROWTH))
+        self.bucket_counts[bucket] = self.bucket_counts.get(bucket, 0) + 1
+        self.count += 1
+        self.max_seconds = seconds if self.max_seconds is None else max(self.max_seconds, seconds)
+
+    def quantile(self, q):
+        """Returns the duration below which q of the durations fall, as the top of its bucket,
+        or None if nothing has been counted"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        counted = 0
+        for bucket in sorted(self.bucket_counts):
+            counted += self.bucket_counts[bucket]
+            if counted >= rank:
+                return min(LATENCY_MIN_SECONDS * LATENCY_BUCKET_GROWTH ** bucket, self.max_seconds)
+
+    def summary(self, prefix="Seconds"):
+        """Returns a dictionary of the LATENCY_QUANTILES and the max, named like 'Seconds P99'"""
+        latency_summary = {prefix + " " + name: self.quantile(q) for name, q in LATENCY_QUANTILES}
+        latency_summary[prefix + " Max"] = self.max_seconds
+        return latency_summary
+
+
+class RunLog:
+    """Records how long each phase of a run takes and stats for each file profiled,
+    as json lines. Lines are written to json_lines_path as they happen if it's given.
+    Only totals and the slowest files are kept in memory, so big runs stay small"""
+
+    def __init__(self, json_lines_path=None, slowest_files_shown=SLOWEST_FILES_SHOWN):
+        self.stream = None if json_lines_path is None else open(json_lines_path, 'w', encoding='utf-8')
+        self.slowest_files_shown = slowest_files_shown
+        self.phase_seconds = {}
+        self.file_totals = {"Files": 0,
+                            "Bytes Read": 0,
+                            "Rows Scanned": 0,
+                            "Header Seconds": 0.0,
+                            "Fingerprint Seconds": 0.0}
+        self.outcomes = {}
+        self.file_latency = LatencyHistogram()
+        # Min heap of (seconds, order, file stats), so the fastest of the slowest is dropped first
+        self.slowest_files = []
+
+    def emit(self, record):
+        """Writes one record as a json line, if there's a file to write to"""
+        if self.stream is not None:
+            self.stream.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def phase(self, name, details=None):
+        """Context manager timing a phase of the run, with an optional dictionary of details
+        to add to its line. Phases run more than once add up in the summary"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+            self.emit({"Event": "Phase", "Phase": name, "Seconds": seconds, **(details or {})})
+
+    def record_file(self, file_stats):
+        """Records the stats of one file, see profile_file"""
+        self.emit({"Event": "File", **file_stats})
+        self.file_totals["Files"] += 1
+        self.outcomes[file_stats["Outcome"]] = self.outcomes.get(file_stats["Outcome"], 0) + 1
+        for total_name in ("Bytes Read", "Rows Scanned", "Header Seconds", "Fingerprint Seconds"):
+            self.file_totals[total_name] += file_stats.get(total_name) or 0
+
+        if file_stats.get("Seconds") is not None:
+            self.file_latency.add(file_stats["Seconds"])
+            heap_item = (file_stats["Seconds"], self.file_totals["Files"], file_stats)
+            if len(self.slowest_files) < self.slowest_files_shown:
+                heapq.heappush(self.slowest_files, heap_item)
+            else:
+                heapq.heappushpop(self.slowest_files, heap_item)
+
+    def summary(self):
+        """Returns the end of run summary, with the phase times, file totals, the tail latency
+        of the files profiled and the slowest files"""
+        return {"Event": "Summary",
+                "Phase Seconds": dict(self.phase_seconds),
+                **self.file_totals,
+                "Outcomes": dict(self.outcomes),
+                **self.file_latency.summary("File Seconds"),
+                "Slowest Files": [file_stats for seconds, order, file_stats
+                                  in sorted(self.slowest_files, key=lambda item: (-item[0], item[1]))]}
+
+    def close(self):
+        """Writes the summary as the last line and closes the file. Returns the summary"""
+        run_summary = self.summary()
+        self.emit(run_summary)
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        return run_summary
+
+
+def timed_phase(run_log, name, details=None):
+    """Function to time a phase in a run log, doing nothing if there's no run log"""
+    return nullcontext() if run_log is None else run_log.phase(name, details)
+
+
+def summary_messages(run_summary):
+    """Function to turn a run summary into lines in the same style as message_list"""
+    messages = [' | '.join(["Phase Seconds"] + ['{}: {:.3f}'.format(name, seconds)
+                                                 for name, seconds in run_summary["Phase Seconds"].items()])]
+    messages.append(' | '.join(["File Totals",
+                                "Bytes Read: " + str(run_summary["Bytes Read"]),
+                                "Rows Scanned: " + str(run_summary["Rows Scanned"]),
+                                "Header Seconds: {:.3f}".format(run_summary["Header Seconds"]),
+                                "Fingerprint Seconds: {:.3f}".format(run_summary["Fingerprint Seconds"])]))
+    if run_summary.get("File Seconds Max") is not None:
+        latency_names = [name for name, q in LATENCY_QUANTILES] + ["Max"]
+        messages.append(' | '.join(["File Latency"] + ['{}: {:.3f}'.format(name, run_summary["File Seconds " + name])
+                                                        for name in latency_names]))
+    for file_stats in run_summary["Slowest Files"]:
+        messages.append(' | '.join(["Slow File", "{:.3f} sec".format(file_stats["Seconds"]), file_stats["FilePath"]]))
+    return messages
@@ -0,0 +1,1037 @@
+import codecs
+import csv
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
+import re
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, nullcontext
+from functools import partial
+
+# |||||||||||||||||||
+# FILE PROFILING
+# |||||||||||||||||||
+
+# Status messages kept in memory for the window, older ones are only in the log file
+MESSAGE_TAIL_LENGTH = 1000
+
+
+class MessageLog:
+    """Status messages of a run. Only the last tail_length are kept in memory, for
+    showing in the window, and while a log file is open every message is also written
+    to it as it comes, so a long run's messages don't pile up in memory"""
+
+    def __init__(self, tail_length=MESSAGE_TAIL_LENGTH):
+        self.tail = deque(maxlen=tail_length)
+        self.log_file = None
+
+    def open_log(self, path):
+        """Starts writing messages to a log file at path. The file is line buffered,
+        so it holds every message up to a crash"""
+        self.close_log()
+        self.log_file = open(path, 'w', encoding='utf-8', buffering=1)
+
+    def close_log(self):
+        """Stops writing messages to the log file, if one is open"""
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def append(self, message):
+        self.tail.append(message)
+        if self.log_file is not None:
+            self.log_file.write(message + "\n")
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def clear(self):
+        self.tail.clear()
+
+    def __iter__(self):
+        return iter(self.tail)
+
+    def __len__(self):
+        return len(self.tail)
+
+
+# For storing status messages
+message_list = MessageLog()
+
+# How many rows from the top of each file are used to find headers by default.
+# None means the whole file is always scanned
+DEFAULT_SCAN_ROWS = 1000
+
+# Bytes and rows from the start of each csv file used to detect its encoding and delimiter
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_SNIFF_ROWS = 100
+
+# Byte order marks, checked longest first since the UTF-32 LE mark starts with the UTF-16 LE one
+BYTE_ORDER_MARKS = ((codecs.BOM_UTF32_LE, "utf-32"),
+                    (codecs.BOM_UTF32_BE, "utf-32"),
+                    (codecs.BOM_UTF8, "utf-8-sig"),
+                    (codecs.BOM_UTF16_LE, "utf-16"),
+                    (codecs.BOM_UTF16_BE, "utf-16"))
+
+# Delimiters csv files are checked for, in order of preference when tied, and their names in references
+CSV_DELIMITERS = (",", ";", "\t", "|")
+DELIMITER_NAMES = {",": "comma", ";": "semicolon", "\t": "tab", "|": "pipe"}
+
+# Csv files at least this big are read with fast_csv_scan when read in full, and the bytes of one
+# scanned at a time, which bounds the memory the scan uses
+CSV_FAST_SCAN_BYTES = 1024 * 1024
+CSV_FAST_SCAN_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Bytes of lines with quotes fast_csv_scan decodes at once for the csv parser
+CSV_FAST_SCAN_BLOCK_BYTES = 256 * 1024
+
+# Encodings where delimiters, quotes and line ends are single ASCII bytes, so can be counted as bytes
+ASCII_COMPATIBLE_ENCODINGS = ("utf-8", "utf-8-sig", "cp1252", "latin-1")
+
+# Outcomes of files skipped for going over a per file limit, which also stand in for their headers
+SKIPPED_TOO_LARGE = "Skipped: too large"
+SKIPPED_TIMEOUT = "Skipped: timeout"
+
+
+class FileTooLarge(Exception):
+    """Raised when reading a file would go over a per file limit"""
+
+
+# Text values read as numbers and dates when inferring the type of a csv column. Dates are
+# only recognised by shape, as year first or day and month first with slashes
+INTEGER_PATTERN = re.compile(r"[+-]?\d+")
+NUMBER_PATTERN = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+DATE_PATTERN = re.compile(r"\d{4}-\d{1,2}-\d{1,2}([ T].*)?|\d{1,2}/\d{1,2}/\d{2,4}( .*)?")
+
+
+def value_type(value):
+    """Function to infer the type of a single filled cell value, as Integer, Number,
+    Boolean, Date or Text. Text read from csv files is parsed for numbers and dates"""
+    if isinstance(value, str):
+        value = value.strip()
+        if INTEGER_PATTERN.fullmatch(value):
+            return "Integer"
+        if NUMBER_PATTERN.fullmatch(value):
+            return "Number"
+        if DATE_PATTERN.fullmatch(value):
+            return "Date"
+        return "Text"
+    # bool is checked first, as it's a kind of int
+    if isinstance(value, bool):
+        return "Boolean"
+    if isinstance(value, int):
+        return "Integer"
+    if isinstance(value, float):
+        return "Number"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return "Date"
+    return "Text"
+
+
+def combined_type(type_a, type_b):
+    """Function to get the type of a column holding values of two types. None is a
+    column without any values yet. Integers and numbers are numbers, any other mix is text"""
+    if type_a is None or type_a == type_b:
+        return type_b
+    if {type_a, type_b} == {"Integer", "Number"}:
+        return "Number"
+    return "Text"
+
+
+class ColumnProfile:
+    """Collects stats on each column of a table as its rows stream past, for the rows
+    below its header row: the row count, and per column the nulls, the inferred type
+    and the shortest and longest value. Memory only grows with the number of columns.
+    Rows are given with their empty cells as None, so columns keep their positions"""
+
+    def __init__(self):
+        self.start(None)
+
+    def start(self, header_row):
+        """Starts over below a new header row, forgetting the rows counted so far"""
+        self.header_row = header_row
+        self.row_count = 0
+        # [nulls, type, min length, max length] for each column position
+        self.columns = []
+
+    def add_row(self, row):
+        """Counts one row below the header"""
+        self.row_count += 1
+        columns = self.columns
+        for index, value in enumerate(row):
+            if index == len(columns):
+                # A column first reached here was missing, so null, in every row before
+                columns.append([self.row_count - 1, None, None, None])
+            stats = columns[index]
+            if value is None or (isinstance(value, str) and not value.strip()):
+                stats[0] += 1
+                continue
+            stats[1] = combined_type(stats[1], value_type(value))
+            length = len(value) if isinstance(value, str) else len(str(value))
+            stats[2] = length if stats[2] is None else min(stats[2], length)
+            stats[3] = length if stats[3] is None else max(stats[3], length)
+        # Cells past the end of a short row are null
+        for stats in columns[len(row):]:
+            stats[0] += 1
+
+    def summary(self):
+        """Returns the profile as a dictionary, with a dictionary for each filled header in order"""
+        columns = []
+        for index, header in enumerate(self.header_row or []):
+            if header is None:
+                continue
+            nulls, column_type, min_length, max_length = (self.columns[index] if index < len(self.columns)
+                                                          else [self.row_count, None, None, None])
+            columns.append({"Header": header if isinstance(header, str) else str(header),
+                            "Nulls": nulls,
+                            "Type": "Empty" if column_type is None else column_type,
+                            "Min Length": min_length,
+                            "Max Length": max_length})
+        return {"Rows": self.row_count, "Columns": columns}
+
+
+# Bytes hashed from each end of a file for a sampled fingerprint,
+# and the size of each slice fed to the hash for a full fingerprint
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+FINGERPRINT_CHUNK_BYTES = 1024 * 1024
+
+
+class CountingFileIO(io.FileIO):
+    """Raw binary file which adds up the bytes read through it in a read_stats
+    dictionary, so the bytes a parser actually pulled off disk can be reported"""
+
+    def __init__(self, path, read_stats):
+        super().__init__(path, 'rb')
+        self.read_stats = read_stats
+
+    def readinto(self, buffer):
+        bytes_read = super().readinto(buffer)
+        self.read_stats["Bytes Read"] += bytes_read or 0
+        return bytes_read
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.read_stats["Bytes Read"] += len(data or b'')
+        return data
+
+    def readall(self):
+        data = super().readall()
+        self.read_stats["Bytes Read"] += len(data)
+        return data
+
+
+def open_counted(path, read_stats=None, text=False, encoding=None, errors=None):
+    """Function to open a file for reading, counting the bytes read from it in
+    read_stats if given. Text files are opened like open(path, newline='') with
+    the encoding and errors given"""
+    if read_stats is None:
+        return open(path, newline='', encoding=encoding, errors=errors) if text else open(path, 'rb')
+    binary_file = io.BufferedReader(CountingFileIO(path, read_stats))
+    return io.TextIOWrapper(binary_file, newline='', encoding=encoding, errors=errors) if text else binary_file
+
+
+def detect_encoding(prefix):
+    """Function to pick the encoding of a text file from the bytes at its start.
+    A byte order mark settles it. Otherwise text with a zero byte in every other
+    position is taken as UTF-16 of that byte order, and the rest is UTF-8 if the
+    prefix decodes as it, then cp1252, then latin-1, which can decode anything"""
+    for bom, encoding in BYTE_ORDER_MARKS:
+        if prefix.startswith(bom):
+            return encoding
+
+    # ASCII text saved as UTF-16 has a zero byte in every other position
+    even_zeros = prefix[0::2].count(0)
+    odd_zeros = prefix[1::2].count(0)
+    half_length = len(prefix) // 2
+    if half_length and odd_zeros > half_length * 0.3 and even_zeros < half_length * 0.05:
+        return "utf-16-le"
+    if half_length and even_zeros > half_length * 0.3 and odd_zeros < half_length * 0.05:
+        return "utf-16-be"
+
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            # Not final, so a character cut off at the end of the prefix isn't an error
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            pass
+    return "latin-1"
+
+
+def detect_delimiter(rows_text):
+    """Function to pick the delimiter of csv text from CSV_DELIMITERS. The text is
+    parsed with each delimiter, quotes and all, and the one giving the most rows of the
+    same width above one column wins, then the widest. Title rows above a table don't
+    count against a delimiter, as only the most common width is counted. Single column
+    text gets a comma"""
+    best_delimiter = ","
+    best_score = (0, 0)
+    for delimiter in CSV_DELIMITERS:
+        widths = {}
+        for row in csv.reader(rows_text, delimiter=delimiter):
+            if len(row) > 1:
+                widths[len(row)] = widths.get(len(row), 0) + 1
+        if widths:
+            common_width = max(widths, key=lambda width: (widths[width], width))
+            score = (widths[common_width], common_width)
+            if score > best_score:
+                best_delimiter, best_score = delimiter, score
+    return best_delimiter
+
+
+def detect_csv_format(path, read_stats=None, delimiter=None):
+    """Function to detect the encoding and delimiter of a csv file from the first
+    CSV_SNIFF_BYTES of it, so the file can be read right the first time. Returns the
+    encoding and the delimiter, which is only detected if not given, as for tsv files.
+    Bytes read are counted in read_stats if given"""
+    with open_counted(path, read_stats) as f:
+        prefix = f.read(CSV_SNIFF_BYTES)
+    encoding = detect_encoding(prefix)
+    if delimiter is not None:
+        return encoding, delimiter
+
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(prefix, final=False)
+    rows_text = text.splitlines()
+    if len(prefix) == CSV_SNIFF_BYTES and len(rows_text) > 1:
+        # The last line was probably cut off by the end of the prefix
+        rows_text = rows_text[:-1]
+    return encoding, detect_delimiter(rows_text[:CSV_SNIFF_ROWS])
+
+
+def new_read_stats():
+    """Function to make the dictionary the profilers count what they read in"""
+    return {"Bytes Read": 0, "Rows Scanned": 0}
+
+
+def profile_rows(rows, scan_rows=None, max_rows=None, column_profile=None):
+    """Function to stream over rows once, returning the max column count,
+    the header row (the first row with that max), the row count and the scan mode.
+    If scan_rows is given, only that many rows are read. The prefix is reported as
+    'Ambiguous' if the file continues past it and the max isn't confirmed by a later
+    row, including the last row read, since a wider table may start further down.
+    Raises FileTooLarge if more than max_rows rows would have to be read. If a
+    ColumnProfile is given, the rows below the header are added to it in the same
+    pass, and rows are expected with empty cells as None, which aren't counted as columns"""
+    max_col = 0
+    headers_list = None
+    row_count = 0
+    max_col_repeats = 0
+    last_row_len = 0
+    for row in rows:
+        if scan_rows is not None and row_count >= scan_rows:
+            if max_col == 0 or max_col_repeats == 0 or last_row_len != max_col:
+                return max_col, headers_list, row_count, "Ambiguous"
+            return max_col, headers_list, row_count, "Prefix"
+        if max_rows is not None and row_count >= max_rows:
+            raise FileTooLarge("More than {} rows".format(max_rows))
+        row_count += 1
+        if column_profile is not None:
+            raw_row = row
+            row = [value for value in row if value is not None]
+        last_row_len = len(row)
+        # Only the first row to reach a new max is kept, so the header is the first max row
+        if last_row_len > max_col:
+            max_col = last_row_len
+            headers_list = row
+            max_col_repeats = 0
+            if column_profile is not None:
+                column_profile.start(raw_row)
+            continue
+        if last_row_len == max_col:
+            max_col_repeats += 1
+        if column_profile is not None:
+            column_profile.add_row(raw_row)
+    return max_col, headers_list, row_count, "Full"
+
+
+def profile_with_fallback(read_profile, scan_rows, read_stats=None):
+    """Function to run a file's read_profile function over the scan window,
+    re-running it over the full file if that prefix was ambiguous. The rows
+    read by both passes are counted in read_stats if given"""
+    max_col, headers_list, row_count, scan_mode = read_profile(scan_rows)
+    if read_stats is not None:
+        read_stats["Rows Scanned"] += row_count
+    if scan_mode == "Ambiguous":
+        max_col, headers_list, row_count, _ = read_profile(None)
+        scan_mode = "Full (ambiguous prefix)"
+        if read_stats is not None:
+            read_stats["Rows Scanned"] += row_count
+    return max_col, headers_list, row_count, scan_mode
+
+
+def rows_profile(row_reader, path, scan_rows=None, read_stats=None, max_rows=None, column_profile=None):
+    """Function to get the max column count, header row, row count and scan mode
+    for a single file in one streaming pass over the rows from row_reader, which is
+    called with the path and read_stats. Only the first scan_rows rows are read,
+    unless that prefix is ambiguous, in which case the full file is scanned.
+    Raises FileTooLarge past max_rows rows. A ColumnProfile given as column_profile
+    is filled in from the same pass, with the row reader asked to keep empty cells"""
+
+    def read_profile(rows_to_scan):
+        """Reads the profile using the given scan window"""
+        if column_profile is None:
+            rows = row_reader(path, read_stats)
+        else:
+            rows = row_reader(path, read_stats, keep_empty=True)
+        with closing(rows):
+            return profile_rows(rows, rows_to_scan, max_rows, column_profile)
+
+    return profile_with_fallback(read_profile, scan_rows, read_stats)
+
+
+def csv_rows(filepath, read_stats=None, csv_format=None, delimiter=None, keep_empty=False):
+    """Generator that streams the rows of a csv file. csv_format is the (encoding,
+    delimiter) to read with, detected from the start of the file if not given, with
+    the delimiter fixed if given, see detect_csv_format. Bytes read are counted in
+    read_stats if given. Empty fields are always kept, so keep_empty changes nothing"""
+    encoding, delimiter = detect_csv_format(filepath, read_stats, delimiter) if csv_format is None else csv_format
+    # Bytes the encoding can't decode are replaced, so one stray byte can't fail the file
+    with open_counted(filepath, read_stats, text=True, encoding=encoding, errors="replace") as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def csv_profile(filepath, scan_rows=None, read_stats=None, csv_format=None, max_rows=None, delimiter=None,
+                column_profile=None):
+    """Function to get the max column count, header row, row count and scan mode
+    for a single csv file in one streaming pass, see rows_profile. csv_format is the
+    (encoding, delimiter) to read with, detected from the start of the file if not
+    given, with the delimiter fixed if given, see detect_csv_format. Files of at least
+    CSV_FAST_SCAN_BYTES are read with fast_csv_scan whenever they're read in full. Bytes
+    and rows read are counted in read_stats if given, see new_read_stats"""
+    if csv_format is None:
+        csv_format = detect_csv_format(filepath, read_stats, delimiter)
+
+    # Big files read in full only need their rows counted and measured, unless their values are profiled
+    if (column_profile is None and csv_format[0] in ASCII_COMPATIBLE_ENCODINGS
+            and os.path.getsize(filepath) >= CSV_FAST_SCAN_BYTES):
+        def read_profile(rows_to_scan):
+            """Reads the profile using the given scan window, scanning the full file fast"""
+            if rows_to_scan is None:
+                try:
+                    return fast_csv_scan(filepath, csv_format, read_stats, max_rows)
+                except (OSError, ValueError):
+                    # Some network drives can't be memory mapped, so parsing every row instead
+                    pass
+            with closing(csv_rows(filepath, read_stats, csv_format)) as rows:
+                return profile_rows(rows, rows_to_scan, max_rows)
+
+        return profile_with_fallback(read_profile, scan_rows, read_stats)
+
+    return rows_profile(partial(csv_rows, csv_format=csv_format), filepath, scan_rows, read_stats, max_rows,
+                        column_profile)
+
+
+def fast_csv_scan(filepath, csv_format, read_stats=None, max_rows=None):
+    """Function to get the max column count, header row, row count and scan mode of a
+    whole csv file, as csv_profile gives reading every row, without parsing the rows
+    that don't need it. The file is memory mapped and its delimiters and line ends are
+    counted over the raw bytes with numpy, a chunk of lines at a time, so no row is ever
+    made. Only from a line with a quote, or a carriage return that isn't part of a line
+    end, is the csv parser used, until a record ends before a line without either. Only
+    for files in one of the ASCII_COMPATIBLE_ENCODINGS. Bytes read are counted in
+    read_stats if given. Raises FileTooLarge past max_rows rows"""
+    import numpy as np
+
+    encoding, delimiter = csv_format
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # Empty files can't be memory mapped, and have no rows anyway
+        if size == 0:
+            return 0, None, 0, "Full"
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Only counted once mapped, since a file that can't be is read again by the csv parser
+    if read_stats is not None:
+        read_stats["Bytes Read"] += size
+
+    max_col = 0
+    # The header row, or the start and end of its line until it's decoded
+    headers_list = None
+    header_line = None
+    row_count = 0
+    # The byte order mark isn't part of the first line
+    bom_length = len(codecs.BOM_UTF8)
+    position = bom_length if encoding == "utf-8-sig" and mapped[:bom_length] == codecs.BOM_UTF8 else 0
+    line_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+    block_remaining = 0
+
+    def lone_carriage_return(start, end):
+        """Finds the first carriage return from start to end that isn't part of a line
+        end, which the csv parser would split a line on. Returns -1 if there's none"""
+        view = np.frombuffer(mapped, dtype=np.uint8, count=end - start, offset=start)
+        carriage_returns = np.flatnonzero(view == 13)
+        # Chunks end on a new line or the end of the file, so a carriage return at the end is lone
+        lone = carriage_returns[view[np.minimum(carriage_returns + 1, len(view) - 1)] != 10]
+        return start + int(lone[0]) if len(lone) else -1
+
+    def scan_lines(start, end):
+        """Counts the lines from start to end without parsing them. Returns the line count,
+        the widest line's width, and where the first line that wide starts and ends"""
+        view = np.frombuffer(mapped, dtype=np.uint8, count=end - start, offset=start)
+        new_lines = np.flatnonzero(view == 10)
+        line_starts = np.concatenate(([0], new_lines + 1))
+        line_ends = np.append(new_lines, len(view))
+        if line_starts[-1] == len(view):
+            line_starts, line_ends = line_starts[:-1], line_ends[:-1]
+        # Lengths without the line end, since a carriage return before a new line is part of it
+        lengths = line_ends - line_starts
+        lengths -= (lengths > 0) & (view[np.maximum(line_ends - 1, 0)] == 13)
+        delimiters = np.flatnonzero(view == ord(delimiter))
+        delimiter_counts = np.diff(np.searchsorted(delimiters, line_starts), append=len(delimiters))
+        # Blank lines are rows with no columns, like the csv parser gives
+        widths = np.where(lengths > 0, delimiter_counts + 1, 0)
+        widest = int(np.argmax(widths))
+        return (len(line_starts), int(widths[widest]),
+                start + int(line_starts[widest]), start + int(line_starts[widest] + lengths[widest]))
+
+    def parsed_lines():
+        """Generator that yields the decoded lines from position, split like the csv
+        parser's file would be. Lines are decoded a block at a time, with position moved
+        past the block and block_remaining counting down the characters left in it"""
+        nonlocal position, block_remaining
+        while position < size:
+            new_line = mapped.find(b"\n", min(position + CSV_FAST_SCAN_BLOCK_BYTES, size))
+            block_end = size if new_line == -1 else new_line + 1
+            block = mapped[position:block_end].decode(line_encoding, errors="replace")
+            position = block_end
+            block_remaining = len(block)
+            for line in io.StringIO(block, newline=''):
+                block_remaining -= len(line)
+                yield line
+
+    def needs_parsing(start):
+        """Checks if the line from start has a quote, or a carriage return that isn't its line end"""
+        new_line = mapped.find(b"\n", start)
+        line = mapped[start:size if new_line == -1 else new_line]
+        return b'"' in line or b"\r" in (line[:-1] if new_line != -1 else line)
+
+    try:
+        while position < size:
+            # Counting the lines before the next one with a quote, a chunk at a time
+            quote = mapped.find(b'"', position)
+            fast_end = size if quote == -1 else max(position, mapped.rfind(b"\n", position, quote) + 1)
+            while position < fast_end:
+                chunk_end = min(position + CSV_FAST_SCAN_CHUNK_BYTES, fast_end)
+                if chunk_end < fast_end:
+                    # Ending the chunk on a line end, or after the line if it's longer than a chunk
+                    last_new_line = mapped.rfind(b"\n", position, chunk_end)
+                    if last_new_line == -1:
+                        last_new_line = mapped.find(b"\n", chunk_end, fast_end)
+                    chunk_end = fast_end if last_new_line == -1 else last_new_line + 1
+                # Stopping short of a line the csv parser would split differently
+                carriage_return = lone_carriage_return(position, chunk_end)
+                if carriage_return != -1:
+                    fast_end = chunk_end = max(position, mapped.rfind(b"\n", position, carriage_return) + 1)
+                if chunk_end > position:
+                    line_count, width, line_start, line_end = scan_lines(position, chunk_end)
+                    row_count += line_count
+                    if width > max_col:
+                        max_col, headers_list, header_line = width, None, (line_start, line_end)
+                    position = chunk_end
+                if max_rows is not None and row_count > max_rows:
+                    raise FileTooLarge("More than {} rows".format(max_rows))
+
+            # Parsing blocks of records until the line after one can be counted again
+            for row in csv.reader(parsed_lines(), delimiter=delimiter):
+                row_count += 1
+                if len(row) > max_col:
+                    max_col, headers_list, header_line = len(row), row, None
+                if max_rows is not None and row_count > max_rows:
+                    raise FileTooLarge("More than {} rows".format(max_rows))
+                if block_remaining == 0 and not needs_parsing(position):
+                    break
+
+        # The header line had no quotes, so splitting it on the delimiter parses it
+        if header_line is not None:
+            header_text = mapped[header_line[0]:header_line[1]].decode(line_encoding, errors="replace")
+            headers_list = header_text.split(delimiter)
+    finally:
+        mapped.close()
+
+    return max_col, headers_list, row_count, "Full"
+
+
+def csv_max_col(filepath, scan_rows=None):
+    """Function to get the max column length for
+    a single csv file"""
+    return csv_profile(filepath, scan_rows)[0]
+
+
+def xlsx_filled_rows(path, read_stats=None, keep_empty=False):
+    """Generator that streams the filled cell values of each row in the
+    first sheet of an xlsx file. Uses openpyxl's read-only mode, so only
+    the current row is held in memory. Bytes read are counted in read_stats if given.
+    With keep_empty, empty cells are kept as None, so values keep their columns"""
+    import openpyxl
+
+    # openpyxl doesn't close files it's handed, so the counted file is closed here
+    with (nullcontext(path) if read_stats is None else open_counted(path, read_stats)) as source:
+        # this code ignores some useless warnings from openpyxl
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[0]
+            # The stored sheet dimensions can be wrong, so read every row actually in the file
+            worksheet.reset_dimensions()
+            for row in worksheet.iter_rows(values_only=True):
+                yield list(row) if keep_empty else [value for value in row if value is not None]
+        finally:
+            workbook.close()
+
+
+def xlsx_profile(path, scan_rows=None, read_stats=None, max_rows=None, column_profile=None):
+    """Function to get the max filled column count, header row, row count and
+    scan mode for a single xlsx or xlsm file in one streaming pass, see rows_profile.
+    Bytes and rows read are counted in read_stats if given"""
+    return rows_profile(xlsx_filled_rows, path, scan_rows, read_stats, max_rows, column_profile)
+
+
+def xls_filled_rows(path, read_stats=None, keep_empty=False):
+    """Generator that yields the filled cell values of each row in the first sheet
+    of an old style xls file, using xlrd. xlrd parses the whole file up front, but
+    only the first sheet is loaded. Bytes read are counted in read_stats if given.
+    With keep_empty, empty cells are kept as None"""
+    import xlrd
+
+    with open_counted(path, read_stats) as f:
+        contents = f.read()
+    workbook = xlrd.open_workbook(file_contents=contents, on_demand=True)
+    try:
+        worksheet = workbook.sheet_by_index(0)
+        for row_index in range(worksheet.nrows):
+            row = [None if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK) else cell.value
+                   for cell in worksheet.row(row_index)]
+            yield row if keep_empty else [value for value in row if value is not None]
+    finally:
+        workbook.release_resources()
+
+
+def ods_filled_rows(path, read_stats=None, keep_empty=False):
+    """Generator that yields the filled cell values of each row in the first sheet
+    of an OpenDocument spreadsheet. There's no streaming reader for these, so the
+    sheet is read whole through pandas, which needs odfpy. Bytes read are counted in
+    read_stats if given. With keep_empty, empty cells are kept as None"""
+    import pandas as pd
+
+    with open_counted(path, read_stats) as f:
+        sheet_df = pd.read_excel(f, sheet_name=0, header=None, dtype=object, engine="odf")
+    for row in sheet_df.itertuples(index=False, name=None):
+        row = [None if pd.isna(value) else value for value in row]
+        yield row if keep_empty else [value for value in row if value is not None]
+
+
+def parquet_column_type(arrow_type):
+    """Function to get the column profile type of a Parquet column from its Arrow type"""
+    import pyarrow.types as pat
+
+    if pat.is_boolean(arrow_type):
+        return "Boolean"
+    if pat.is_integer(arrow_type):
+        return "Integer"
+    if pat.is_floating(arrow_type) or pat.is_decimal(arrow_type):
+        return "Number"
+    if pat.is_temporal(arrow_type):
+        return "Date"
+    return "Text"
+
+
+def parquet_profile(path, scan_rows=None, read_stats=None, max_rows=None, column_profile=None):
+    """Function to get the column count, column names, row count and scan mode of a
+    Parquet file from its footer, without reading any data pages, so scan_rows and
+    max_rows don't apply. The scan mode is 'Schema'. A ColumnProfile given as
+    column_profile gets the types from the schema and the nulls from the row group
+    statistics, where every row group has them, but no lengths. Needs pyarrow. Bytes
+    read are counted in read_stats if given"""
+    import pyarrow.parquet as pq
+
+    with open_counted(path, read_stats) as f:
+        metadata = pq.ParquetFile(f).metadata
+    arrow_schema = metadata.schema.to_arrow_schema()
+    headers_list = arrow_schema.names
+
+    if column_profile is not None:
+        column_profile.start(headers_list)
+        column_profile.row_count = metadata.num_rows
+        for index, field in enumerate(arrow_schema):
+            nulls = None
+            # Nested columns are stored as more than one column, so their statistics don't line up
+            if metadata.num_columns == len(headers_list):
+                row_group_stats = [metadata.row_group(group).column(index).statistics
+                                   for group in range(metadata.num_row_groups)]
+                if all(stats is not None and stats.has_null_count for stats in row_group_stats):
+                    nulls = sum(stats.null_count for stats in row_group_stats)
+            column_type = parquet_column_type(field.type)
+            column_profile.columns.append([nulls, None if nulls == metadata.num_rows else column_type, None, None])
+
+    return len(headers_list), headers_list, metadata.num_rows, "Schema"
+
+
+# |||||||||||||||||||
+# READER REGISTRY
+# |||||||||||||||||||
+
+# How each file type is profiled, by lower case extension, see register_reader
+READERS = {}
+
+
+def register_reader(extension, label, profiler, row_reader=None, format_detector=None):
+    """Function to add a file type to the reader registry, so files with the extension
+    are crawled and profiled. profiler is called like xlsx_profile and returns the max
+    column count, header row, row count and scan mode. row_reader streams a file's
+    filled rows like xlsx_filled_rows, for get_headers_from_path, and can be left out
+    for formats whose headers come from metadata. Text formats can give a format_detector
+    called like detect_csv_format, whose (encoding, delimiter) is recorded in the reference
+    and passed on to the profiler as csv_format. Profilers taking a column_profile keyword
+    fill in the ColumnProfile given, for builds asking for column profiles, and row readers
+    taking a keep_empty keyword keep empty cells as None. label starts the file's access messages.
+    Readers have to be registered on import, so worker processes have them too"""
+    READERS[extension.lower()] = {"Label": label,
+                                  "Profiler": profiler,
+                                  "Row Reader": row_reader,
+                                  "Format Detector": format_detector}
+
+
+def reader_for(path):
+    """Function to find the registered reader for a file from its extension, or None"""
+    return READERS.get(os.path.splitext(path)[1].lower())
+
+
+def registered_file_types():
+    """Function to list the extensions with a registered reader, for the crawler"""
+    return tuple(READERS)
+
+
+register_reader(".csv", "CSV", csv_profile, csv_rows, detect_csv_format)
+register_reader(".tsv", "TSV", partial(csv_profile, delimiter="\t"), partial(csv_rows, delimiter="\t"),
+                partial(detect_csv_format, delimiter="\t"))
+register_reader(".xlsx", "XLSX", xlsx_profile, xlsx_filled_rows)
+register_reader(".xlsm", "XLSM", xlsx_profile, xlsx_filled_rows)
+register_reader(".xls", "XLS", partial(rows_profile, xls_filled_rows), xls_filled_rows)
+register_reader(".ods", "ODS", partial(rows_profile, ods_filled_rows), ods_filled_rows)
+register_reader(".parquet", "PARQUET", parquet_profile)
+
+
+def get_col_count(path, scan_rows=None):
+    """Function to get the column count for
+    a single file path of any registered type"""
+    reader = reader_for(path)
+    if reader is None:
+        return "Unknown file type"
+
+    try:
+        col_count = reader["Profiler"](path, scan_rows)[0]
+        message_list.append(''.join([file_access_label(path), "SUCCESS | ", path]))
+        return col_count
+    except:
+        message_list.append(''.join([file_access_label(path), "FAILURE | ", path]))
+
+
+def get_headers_from_path(path, max_cols, scan_rows=None):
+    """Returns the headers from a given file of any registered
+    type, assuming that the header is the first row containing the
+    detected max amount of column values. Rows are read with the
+    type's row reader, or the headers taken from the profiler for
+    types without one. If scan_rows is given the header is looked
+    for in that many top rows first, then in the full file"""
+
+    def assign_header(rows):
+        """Looks for the first row with the max amount
+        of columns and returns it"""
+        for x in rows:
+            if len(x) == max_cols:
+                return x
+
+    reader = reader_for(path)
+    if reader is None:
+        raise Exception("Unknown file type: " + path)
+
+    if reader["Row Reader"] is None:
+        headers_list = reader["Profiler"](path, scan_rows)[1]
+    else:
+        # Streams the rows, stopping at the header rather than reading the whole file
+        with closing(reader["Row Reader"](path)) as rows:
+            headers_list = assign_header(itertools.islice(rows, scan_rows))
+        if headers_list is None and scan_rows is not None:
+            with closing(reader["Row Reader"](path)) as rows:
+                headers_list = assign_header(rows)
+
+    # Returns the row containing the headers as a string
+    return "|".join(headers_list)
+
+
+def hash_file_bytes(file_hash, f, size, fingerprint):
+    """Function to feed the bytes of an open binary file to a hash. Memory maps the
+    file and hashes slices of the map, so no copies of the data are made"""
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+        if fingerprint == "full":
+            for start in range(0, size, FINGERPRINT_CHUNK_BYTES):
+                file_hash.update(view[start:start + FINGERPRINT_CHUNK_BYTES])
+        else:
+            file_hash.update(view[:FINGERPRINT_SAMPLE_BYTES])
+            file_hash.update(view[max(FINGERPRINT_SAMPLE_BYTES, size - FINGERPRINT_SAMPLE_BYTES):])
+
+
+def file_fingerprint(path, fingerprint="full"):
+    """Function to get a content fingerprint for a single file. A 'full' fingerprint
+    hashes every byte, a 'sampled' one only hashes the size plus the head and tail
+    of the file, which is much cheaper for big files but can miss edits in the middle.
+    The fingerprint type is kept at the front of the result so types aren't compared"""
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        file_hash.update(str(size).encode())
+        # Empty files can't be memory mapped, and only the size is needed for them anyway
+        if size > 0:
+            try:
+                hash_file_bytes(file_hash, f, size, fingerprint)
+            except (OSError, ValueError):
+                # Some network drives can't be memory mapped, so falling back to large reads
+                f.seek(0)
+                chunk = bytearray(FINGERPRINT_CHUNK_BYTES)
+                with memoryview(chunk) as chunk_view:
+                    if fingerprint == "full":
+                        while bytes_read := f.readinto(chunk):
+                            file_hash.update(chunk_view[:bytes_read])
+                    else:
+                        file_hash.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+                        f.seek(max(FINGERPRINT_SAMPLE_BYTES, size - FINGERPRINT_SAMPLE_BYTES))
+                        file_hash.update(f.read())
+    return ':'.join([fingerprint, file_hash.hexdigest()])
+
+
+def file_access_label(path):
+    """Function to get the label a file's access messages start with, from its
+    registered reader, padded so the statuses line up"""
+    reader = reader_for(path)
+    label = os.path.splitext(path)[1].lstrip(".").upper() if reader is None else reader["Label"]
+    return (label + " Access ").ljust(12)
+
+
+def empty_reference_values(headers_text='Some error occurred'):
+    """Function to make the reference values of a file which couldn't be profiled,
+    with headers_text in place of the headers"""
+    return {"Max Column Count": None,
+            "Row Count": None,
+            "Headers List": headers_text,
+            "Header Scan Mode": None,
+            "Content Fingerprint": None,
+            "Encoding": None,
+            "Delimiter": None,
+            "Column Profile": None}
+
+
+def unprofiled_result(path, outcome, seconds=None):
+    """Function to make the profile_file result of a file that wasn't profiled, where
+    outcome is SKIPPED_TOO_LARGE or SKIPPED_TIMEOUT for a file over a limit, which also
+    stands in for its headers, or "Failure" for a file whose worker process died"""
+    file_stats = {"FilePath": path,
+                  "Outcome": outcome,
+                  "Seconds": seconds,
+                  "Header Seconds": None,
+                  "Fingerprint Seconds": None,
+                  **new_read_stats()}
+    if outcome == "Failure":
+        return empty_reference_values(), ''.join([file_access_label(path), "FAILURE | ", path]), file_stats
+    message = ''.join([file_access_label(path), "SKIPPED | ", path, " | ", outcome])
+    return empty_reference_values(outcome), message, file_stats
+
+
+def profile_file(path, scan_rows=None, fingerprint=None, max_file_bytes=None, max_rows=None, column_profile=False):
+    """Function to profile a single file path of any registered type. Returns a dictionary of
+    the values for its reference columns, the access status message, and a dictionary
+    of stats on the work done: seconds taken overall, finding headers and fingerprinting,
+    bytes and rows read, and the outcome. Each file is only read once, unless the scan
+    window turns out to be ambiguous, after detecting the encoding and delimiter of csv
+    and tsv files from their first few kilobytes. A 'full' or 'sampled' content fingerprint is added
+    if asked for. Files bigger than max_file_bytes aren't read, and reading stops past
+    max_rows rows, both giving a SKIPPED_TOO_LARGE result. With column_profile, a
+    ColumnProfile of the rows below the header is added as json, from the same pass,
+    and the whole file is always read so it covers every row. The row count is only
+    given when the whole file was read, not just a prefix. Doesn't touch any
+    globals, so it can run in a worker process"""
+    start = time.perf_counter()
+
+    if max_file_bytes is not None:
+        try:
+            if os.path.getsize(path) > max_file_bytes:
+                return unprofiled_result(path, SKIPPED_TOO_LARGE, time.perf_counter() - start)
+        except OSError:
+            # Left for the profiler to report as a failure
+            pass
+
+    file_label = file_access_label(path)
+    reader = reader_for(path)
+
+    reference_values = empty_reference_values()
+    read_stats = new_read_stats()
+    file_stats = {"FilePath": path,
+                  "Outcome": "Failure",
+                  "Seconds": None,
+                  "Header Seconds": None,
+                  "Fingerprint Seconds": None}
+
+    if fingerprint is not None:
+        fingerprint_start = time.perf_counter()
+        try:
+            reference_values["Content Fingerprint"] = file_fingerprint(path, fingerprint)
+        except OSError:
+            pass
+        file_stats["Fingerprint Seconds"] = time.perf_counter() - fingerprint_start
+
+    header_start = time.perf_counter()
+    try:
+        if reader is None:
+            raise ValueError("No reader registered for " + path)
+        profiler = reader["Profiler"]
+        if reader["Format Detector"] is not None:
+            # Detecting the format first, so it's recorded and the file is read right the first time
+            encoding, delimiter = reader["Format Detector"](path, read_stats)
+            reference_values["Encoding"] = encoding
+            reference_values["Delimiter"] = DELIMITER_NAMES.get(delimiter, delimiter)
+            profiler = partial(profiler, csv_format=(encoding, delimiter))
+        if column_profile:
+            table_profile = ColumnProfile()
+            profiler = partial(profiler, column_profile=table_profile)
+            scan_rows = None
+        max_col, headers_list, row_count, scan_mode = profiler(path, scan_rows, read_stats, max_rows=max_rows)
+    except FileTooLarge:
+        reference_values["Headers List"] = SKIPPED_TOO_LARGE
+        file_stats["Outcome"] = SKIPPED_TOO_LARGE
+        message = ''.join([file_label, "SKIPPED | ", path, " | ", SKIPPED_TOO_LARGE])
+    except:
+        message = ''.join([file_label, "FAILURE | ", path])
+    else:
+        reference_values["Max Column Count"] = max_col
+        reference_values["Header Scan Mode"] = scan_mode
+        # Only known when the whole file was read, or its footer says
+        if scan_mode != "Prefix":
+            reference_values["Row Count"] = row_count
+        # Keeping the headers as a list, so writers can store them natively or joined
+        if headers_list is not None and all(isinstance(header, str) for header in headers_list):
+            reference_values["Headers List"] = list(headers_list)
+        if column_profile:
+            reference_values["Column Profile"] = json.dumps(table_profile.summary())
+        file_stats["Outcome"] = "Success"
+        message = ''.join([file_label, "SUCCESS | ", path])
+
+    end = time.perf_counter()
+    file_stats["Header Seconds"] = end - header_start
+    file_stats["Seconds"] = end - start
+    file_stats.update(read_stats)
+    return reference_values, message, file_stats
+
+
+def guarded_worker(connection, profile_options):
+    """Function run by each process of guarded_profile_files. Profiles the paths sent
+    down the connection one at a time, sending back each result, until sent None"""
+    while (path := connection.recv()) is not None:
+        connection.send(profile_file(path, **profile_options))
+
+
+def guarded_profile_files(paths, workers, timeout_seconds, profile_options):
+    """Generator that yields the profile_file results for each path in order, like
+    profile_files, with each file given at most timeout_seconds. Every file goes to a
+    process of its own pool, one file at a time, so a process stuck on a file past the
+    timeout can be killed and replaced without holding up the rest. Those files get a
+    SKIPPED_TIMEOUT result"""
+    import multiprocessing
+    from multiprocessing.connection import wait
+
+    def start_worker():
+        """Starts a worker process, returning it and the parent's end of its pipe"""
+        parent_end, child_end = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=guarded_worker, args=(child_end, profile_options), daemon=True)
+        process.start()
+        child_end.close()
+        return process, parent_end
+
+    pool = [start_worker() for _ in range(max(1, min(workers, len(paths))))]
+    # What each worker is doing, as the index of its path and when it was sent
+    busy = {}
+    results = {}
+    next_path = 0
+    next_result = 0
+    try:
+        while next_result < len(paths):
+            # Keeping every idle worker busy
+            for worker_index, (process, connection) in enumerate(pool):
+                if worker_index not in busy and next_path < len(paths):
+                    connection.send(paths[next_path])
+                    busy[worker_index] = (next_path, time.monotonic())
+                    next_path += 1
+
+            # Waiting for a result, or for the next worker to run out of time
+            deadline = min(started for path_index, started in busy.values()) + timeout_seconds
+            ready = wait([pool[worker_index][1] for worker_index in busy], max(0.0, deadline - time.monotonic()))
+            for worker_index in list(busy):
+                process, connection = pool[worker_index]
+                path_index, started = busy[worker_index]
+                if connection in ready:
+                    try:
+                        results[path_index] = connection.recv()
+                    except EOFError:
+                        # The worker died on this file, such as running out of memory
+                        results[path_index] = unprofiled_result(paths[path_index], "Failure",
+                                                                time.monotonic() - started)
+                    else:
+                        del busy[worker_index]
+                        continue
+                elif time.monotonic() - started < timeout_seconds:
+                    continue
+                else:
+                    results[path_index] = unprofiled_result(paths[path_index], SKIPPED_TIMEOUT,
+                                                            time.monotonic() - started)
+                process.kill()
+                process.join()
+                connection.close()
+                pool[worker_index] = start_worker()
+                del busy[worker_index]
+
+            # Results come back in any order, so holding them until the earlier ones are done
+            while next_result in results:
+                yield results.pop(next_result)
+                next_result += 1
+    finally:
+        for worker_index, (process, connection) in enumerate(pool):
+            if worker_index in busy:
+                process.kill()
+            else:
+                try:
+                    connection.send(None)
+                except OSError:
+                    process.kill()
+            process.join()
+            connection.close()
+
+
+def profile_files(paths, workers=1, timeout_seconds=None, **profile_options):
+    """Generator that yields the profile_file results for each path, in the same
+    order as paths. profile_options are passed on to profile_file. With more than
+    one worker the files are profiled across a pool of processes, since parsing
+    is CPU bound and threads wouldn't help. With timeout_seconds, files are profiled
+    in processes that are killed if a file takes longer, see guarded_profile_files"""
+    if timeout_seconds is not None and paths:
+        yield from guarded_profile_files(paths, workers, timeout_seconds, profile_options)
+        return
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield profile_file(path, **profile_options)
+        return
+
+    # Handing out files in chunks cuts down the overhead of sending work to processes
+    chunk_size = max(1, len(paths) // (workers * 4))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield from executor.map(partial(profile_file, **profile_options), paths, chunksize=chunk_size)
+    finally:
+        # If the caller stops early, such as on a cancel, the queued files are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,514 @@
+import codecs
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from .crawler import DEFAULT_EXCLUDE_GLOBS, DEFAULT_PRUNE_GLOBS, walk_directory
+from .instrumentation import LatencyHistogram, summary_messages, timed_phase
+from .profiling import (DEFAULT_SCAN_ROWS, SKIPPED_TIMEOUT, SKIPPED_TOO_LARGE, message_list, profile_files,
+                        registered_file_types)
+
+# |||||||||||||||||||
+# REFERENCE BUILDER
+# |||||||||||||||||||
+
+# Name of the cache file kept next to the reference files, so unchanged files aren't re-read
+REFERENCE_CACHE_NAME = "ReferenceCache.json"
+
+
+# Formats a reference can be saved in. csv is readable by people, parquet stores the
+# header lists natively and loads much faster, but needs pyarrow installed
+REFERENCE_FORMATS = ("csv", "parquet")
+
+# Bumped whenever the cached reference values change shape, so old entries are re-read
+REFERENCE_CACHE_VERSION = 4
+
+# Joins header lists in csv references, so they fit in a single cell
+HEADER_SEPARATOR = "|"
+
+# UTF-8 byte order marks older references kept on the first header, as read and as cp1252 read it
+BYTE_ORDER_MARK_PREFIXES = ("\ufeff", codecs.BOM_UTF8.decode("cp1252"))
+
+
+def timestamped_output_path(save_folder, output_name, file_extension=".csv"):
+    """Function to build the path of a timestamped output file in a folder. Files
+    from earlier runs in the same minute are numbered, rather than overwritten"""
+    x = datetime.now()
+    DateTimeString = x.strftime(" %Y-%m-%d %I-%M%p")
+    path = ''.join([save_folder, "/", output_name, DateTimeString, file_extension])
+    run_number = 2
+    while os.path.exists(path) or os.path.exists(path + PARTIAL_SUFFIX):
+        path = ''.join([save_folder, "/", output_name, DateTimeString, " (", str(run_number), ")", file_extension])
+        run_number += 1
+    return path
+
+
+def write_reference(reference_df, path, reference_format="csv"):
+    """Function to save a reference DataFrame in one of the REFERENCE_FORMATS.
+    Header lists are joined with HEADER_SEPARATOR for csv, and kept as lists for parquet"""
+    reference_df = reference_df.copy()
+    if reference_format == "csv":
+        reference_df["Headers List"] = [HEADER_SEPARATOR.join(x) if isinstance(x, list) else x
+                                        for x in reference_df["Headers List"]]
+        reference_df.to_csv(path, index=False)
+    elif reference_format == "parquet":
+        # Error text is stored as a one item list, matching how it reads back from a csv
+        reference_df["Headers List"] = [x if isinstance(x, list) else [x] for x in reference_df["Headers List"]]
+        reference_df.to_parquet(path, index=False)
+    else:
+        raise ValueError("Unknown reference format: " + str(reference_format))
+
+
+# Columns of a reference file, in order
+REFERENCE_COLUMNS = ("FilePath", "Directory", "FileName", "FileType", "Max Column Count", "Headers List",
+                     "Header Scan Mode", "Content Fingerprint", "Encoding", "Delimiter", "Directory Digest",
+                     "Column Profile", "Row Count")
+
+# Columns of whole numbers, stored as nullable integers in parquet. Every other column is text
+INTEGER_COLUMNS = ("Max Column Count", "Row Count")
+
+# Rows a ReferenceWriter holds before flushing them to disk, as one parquet row group
+REFERENCE_FLUSH_ROWS = 1000
+
+# Added to the path of a reference while it's being written
+PARTIAL_SUFFIX = ".partial"
+
+
+class ReferenceWriter:
+    """Writes a reference file a row at a time in one of the REFERENCE_FORMATS, so a build
+    never holds the whole reference in memory. Rows are written to path plus PARTIAL_SUFFIX,
+    which commit renames to path in one step, so a crash never leaves a half written file
+    under the final name. Rows are flushed every REFERENCE_FLUSH_ROWS rows, so a csv partial
+    file can be read up to there even after a hard crash. A parquet file can only be read
+    once closed, which writes its footer. path can be changed before commit to save elsewhere"""
+
+    def __init__(self, path, reference_format="csv", columns=REFERENCE_COLUMNS):
+        if reference_format not in REFERENCE_FORMATS:
+            raise ValueError("Unknown reference format: " + str(reference_format))
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.reference_format = reference_format
+        self.columns = list(columns)
+        self.buffer = []
+        self.closed = False
+
+        if reference_format == "csv":
+            self.file = open(self.partial_path, 'w', newline='', encoding='utf-8')
+            self.csv_writer = csv.writer(self.file, lineterminator=os.linesep)
+            self.csv_writer.writerow(self.columns)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self.schema = pa.schema([(col, pa.list_(pa.string()) if col == "Headers List"
+                                      else pa.int64() if col in INTEGER_COLUMNS else pa.string())
+                                     for col in self.columns])
+            self.parquet_writer = pq.ParquetWriter(self.partial_path, self.schema)
+
+    def write_row(self, row):
+        """Adds a row, given as a dictionary of column names to values. Missing columns are left empty"""
+        headers = row.get("Headers List")
+        if self.reference_format == "csv":
+            # Joining header lists to fit a single cell, like write_reference
+            row = {**row, "Headers List": HEADER_SEPARATOR.join(headers) if isinstance(headers, list) else headers}
+        else:
+            # Error text is stored as a one item list, matching how it reads back from a csv
+            row = {**row, "Headers List": headers if isinstance(headers, list) or headers is None else [headers]}
+        self.buffer.append([row.get(col) for col in self.columns])
+        if len(self.buffer) >= REFERENCE_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows to the partial file"""
+        if self.reference_format == "csv":
+            self.csv_writer.writerows(self.buffer)
+            self.file.flush()
+        elif self.buffer:
+            import pyarrow as pa
+
+            self.parquet_writer.write_table(pa.Table.from_pylist([dict(zip(self.columns, values))
+                                                                  for values in self.buffer], schema=self.schema))
+        self.buffer = []
+
+    def commit(self):
+        """Finishes the file and renames it to path. Returns path"""
+        self.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def close(self):
+        """Flushes and closes the partial file without renaming it, such as when a build fails
+        part way, so the rows done so far are kept. Does nothing if already closed"""
+        if self.closed:
+            return
+        self.closed = True
+        self.flush()
+        if self.reference_format == "csv":
+            self.file.close()
+        else:
+            self.parquet_writer.close()
+
+
+# Columns read as text, so names like "0012" aren't turned into numbers
+TEXT_COLUMNS = ("FilePath", "Directory", "FileName", "FileType", "Header Scan Mode", "Content Fingerprint",
+                "Encoding", "Delimiter", "Directory Digest", "Column Profile")
+
+
+def is_parquet_reference(path):
+    """Function to check if a reference file is saved as parquet, going by its extension"""
+    return path.lower().endswith(".parquet")
+
+
+def reference_columns(path):
+    """Function to get the column names of a reference file without reading its rows"""
+    if is_parquet_reference(path):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+
+    import pandas as pd
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def header_list(value):
+    """Function to turn a Headers List value as read from a reference into a list of headers.
+    Joined csv headers are split, parquet arrays are kept, and missing headers are no headers.
+    References from before encodings were detected kept the UTF-8 byte order mark on the
+    first header, either as is or read as cp1252, so it's dropped in both forms to compare
+    them with newer references"""
+    if isinstance(value, str):
+        headers = value.split(HEADER_SEPARATOR)
+    elif value is None or isinstance(value, float):
+        return []
+    else:
+        headers = list(value)
+    for prefix in BYTE_ORDER_MARK_PREFIXES:
+        if headers and headers[0].startswith(prefix):
+            headers[0] = headers[0][len(prefix):]
+    return headers
+
+
+def headers_as_lists(reference_df):
+    """Function to turn the Headers List column of a freshly read reference into lists"""
+    if "Headers List" in reference_df.columns:
+        reference_df["Headers List"] = [header_list(x) for x in reference_df["Headers List"]]
+    return reference_df
+
+
+def iter_reference_chunks(path, columns=None, chunk_rows=None):
+    """Generator that reads a reference file saved in any of the REFERENCE_FORMATS, picked
+    by the file extension, as DataFrames of up to chunk_rows rows. Reads the whole file
+    as one DataFrame if chunk_rows is None. Only the named columns are read if columns is
+    given, skipping any the file doesn't have. Headers List is always read as lists"""
+    import pandas as pd
+
+    if is_parquet_reference(path):
+        import pyarrow.parquet as pq
+
+        # Parquet is columnar, so only the wanted columns are read off disk
+        column_names = [col for col in pq.read_schema(path).names if columns is None or col in columns]
+        if chunk_rows is None:
+            yield headers_as_lists(pd.read_parquet(path, columns=column_names))
+            return
+        with pq.ParquetFile(path) as parquet_file:
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=column_names):
+                yield headers_as_lists(batch.to_pandas())
+        return
+
+    reader = pd.read_csv(path, usecols=None if columns is None else lambda col: col in columns,
+                         dtype={col: str for col in TEXT_COLUMNS}, chunksize=chunk_rows)
+    if chunk_rows is None:
+        yield headers_as_lists(reader)
+        return
+    with reader:
+        for chunk in reader:
+            yield headers_as_lists(chunk)
+
+
+def read_reference(path, columns=None):
+    """Function to read a whole reference file saved in any of the REFERENCE_FORMATS,
+    see iter_reference_chunks"""
+    return next(iter_reference_chunks(path, columns))
+
+
+def export_reference_csv(reference_path, csv_path=None):
+    """Function to save a copy of a reference file as a csv, for reading by people.
+    The csv is saved next to the reference unless csv_path is given. Returns its path"""
+    if csv_path is None:
+        csv_path = os.path.splitext(reference_path)[0] + ".csv"
+    write_reference(read_reference(reference_path), csv_path, "csv")
+    return csv_path
+
+
+def load_reference_cache(cache_path):
+    """Function to load the reference cache from a json file, returning an
+    empty cache if the file doesn't exist or can't be read"""
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_reference_cache(cache_path, cache):
+    """Function to save the reference cache as a json file. Writes to a temp
+    file first, so a crash can't leave a half written cache"""
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(temp_path, cache_path)
+
+
+def clear_reference_cache(save_folder):
+    """Function to delete the reference cache in a folder, so the next
+    build re-reads every file"""
+    cache_path = os.path.join(save_folder, REFERENCE_CACHE_NAME)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+
+def directory_digest(file_entries, sub_directory_names):
+    """Function to get the digest of a directory from its direct children: the name, size,
+    modified time and reference values of each file crawled, and the names of the sub
+    directories walked. Children are sorted first, so the order they were listed in doesn't
+    matter. Two directories with the same path and digest have identical reference rows
+    for their own files. Sub directories are only covered by name, not by their digests,
+    so a matching digest says nothing about what's below it. Returns None if a file
+    couldn't be statted, as it can't be told apart from a changed one"""
+    if any(stat_key is None for name, stat_key, reference_values in file_entries):
+        return None
+    digest_inputs = [sorted(file_entries, key=lambda entry: entry[0]), sorted(sub_directory_names)]
+    return hashlib.blake2b(json.dumps(digest_inputs, sort_keys=True, default=str).encode(),
+                           digest_size=16).hexdigest()
+
+
+def build_reference(target_dir, save_folder, scan_rows=DEFAULT_SCAN_ROWS, workers=1, use_cache=False,
+                    fingerprint=None, include_globs=None, exclude_globs=DEFAULT_EXCLUDE_GLOBS,
+                    prune_globs=DEFAULT_PRUNE_GLOBS, reference_format="csv", progress_callback=None,
+                    cancel_event=None, run_log=None, log_path=None, snapshot_store=None, max_file_bytes=None,
+                    max_rows=None, timeout_seconds=None, column_profile=False):
+    """Function to build and save reference files of spreadsheets in a specified folder.
+    Headers are detected from the top scan_rows rows of each file, pass None to always
+    scan full files. Set workers above 1 to profile files in parallel processes.
+    Set fingerprint to 'full' or 'sampled' to add content fingerprints to the reference.
+    With use_cache, results are kept in a cache file in save_folder keyed on each file's
+    path, size and modified time, and only new or changed files are re-read.
+    include_globs, exclude_globs and prune_globs filter the crawl, see crawl_files.
+    reference_format is one of REFERENCE_FORMATS, see ReferenceWriter. Each file's row is
+    written as soon as it's profiled, and the file only gets its final name once complete.
+    progress_callback is called with a progress dictionary after each file, and setting
+    cancel_event (a threading.Event) stops the run early, saving a partial reference of
+    the files done so far. Each row carries the digest of its directory, see
+    directory_digest, which lets comparisons pass over unchanged directories. Pass a
+    RunLog as run_log to record phase times and the stats of each file. Status messages
+    are written to log_path as they come if given, with only the latest kept in
+    message_list. The reference is also added as a snapshot to the SQLite store at
+    snapshot_store if given, see snapshots.py. Files bigger than max_file_bytes or
+    longer than max_rows rows are skipped, and with timeout_seconds files are profiled
+    in processes that are killed when a file takes longer. Skipped files are kept in
+    the reference with the reason in place of their headers. Returns a dictionary
+    summarising the run, including the tail latency of the files profiled. With
+    column_profile, each file's row count and the nulls, type and value lengths of
+    each column are added as json, which means reading every file in full"""
+
+    # Checking the format up front, rather than after every file has been read
+    if reference_format not in REFERENCE_FORMATS:
+        raise ValueError("Unknown reference format: " + str(reference_format))
+
+    # Clearing in place, since other modules hold a reference to the same list
+    message_list.clear()
+    if log_path is not None:
+        message_list.open_log(log_path)
+    try:
+        return write_reference_rows(target_dir, save_folder, scan_rows, workers, use_cache, fingerprint,
+                                    include_globs, exclude_globs, prune_globs, reference_format,
+                                    progress_callback, cancel_event, run_log, snapshot_store, max_file_bytes,
+                                    max_rows, timeout_seconds, column_profile)
+    finally:
+        message_list.close_log()
+
+
+def write_reference_rows(target_dir, save_folder, scan_rows, workers, use_cache, fingerprint, include_globs,
+                         exclude_globs, prune_globs, reference_format, progress_callback, cancel_event, run_log,
+                         snapshot_store, max_file_bytes, max_rows, timeout_seconds, column_profile):
+    """Function doing the work of build_reference, see there for the arguments. Crawls
+    the directory, then streams a row per file to a ReferenceWriter in crawl order,
+    taking each from the cache or the profilers. A directory's rows are held until
+    all its files are done, so they can be written with the directory's digest"""
+
+    # Crawling for only the file types that can be profiled, as plain tuples rather than a DataFrame.
+    # The sizes and modified times are kept for the cache
+    crawl_summary = {"Entries Visited": 0,
+                     "Entries Skipped": 0}
+    crawled_files = []
+    sub_directory_names = {}
+    with timed_phase(run_log, "Walk"):
+        for current_directory, files, sub_directories in walk_directory(target_dir, registered_file_types(),
+                                                                        include_globs, exclude_globs, prune_globs,
+                                                                        crawl_summary):
+            for file_path, file_name, file_type, file_size, modified_time in files:
+                stat_key = None if file_size is None or modified_time is None else [file_size, modified_time]
+                crawled_files.append((file_path, current_directory, file_name, file_type, stat_key))
+            sub_directory_names[current_directory] = [os.path.basename(path) for path in sub_directories]
+
+    profile_options = {"scan_rows": scan_rows, "fingerprint": fingerprint}
+    # Only added when asked for, so caches from before column profiles still match
+    if column_profile:
+        profile_options["column_profile"] = True
+    # Kept out of the cache key, as a file profiled within the limits gives the same result without them
+    profile_limits = {"max_file_bytes": max_file_bytes, "max_rows": max_rows}
+
+    cache_path = os.path.join(save_folder, REFERENCE_CACHE_NAME)
+    cache = load_reference_cache(cache_path) if use_cache else {}
+
+    def cached_result(path, stat_key):
+        """The cached reference values and message of a file, or None if it has to be profiled"""
+        cached = cache.get(path)
+        if (cached is not None and stat_key is not None
+                and cached["Stat"] == stat_key and cached.get("Profile Options") == profile_options
+                and cached.get("Cache Version") == REFERENCE_CACHE_VERSION):
+            return cached["Reference Values"], cached["Message"]
+        return None
+
+    # Working out which files are unchanged before starting, so only the rest go to the profilers
+    paths_to_profile = [path for path, directory, file_name, file_type, stat_key in crawled_files
+                        if cached_result(path, stat_key) is None]
+    cache_hits = len(crawled_files) - len(paths_to_profile)
+
+    files_done = 0
+    files_profiled = 0
+    files_skipped = 0
+    file_latency = LatencyHistogram()
+    profile_start = time.monotonic()
+
+    def report_progress(current_path):
+        """Sends the progress so far to the callback, with an ETA based on the throughput of this run"""
+        if progress_callback is None:
+            return
+        files_per_second = files_profiled / max(time.monotonic() - profile_start, 1e-9)
+        files_remaining = len(crawled_files) - files_done
+        progress_callback({"Files Done": files_done,
+                           "Files Total": len(crawled_files),
+                           "Current File": current_path,
+                           "Files Per Second": files_per_second,
+                           "ETA Seconds": files_remaining / files_per_second if files_profiled else None})
+
+    report_progress(None)
+    cancelled = False
+    writer = ReferenceWriter(timestamped_output_path(save_folder, "ReferenceFile", "." + reference_format),
+                             reference_format)
+    snapshot_writer = None
+    if snapshot_store is not None:
+        # Imported here as the snapshot store builds on this module
+        from .snapshots import SnapshotWriter
+        snapshot_writer = SnapshotWriter(snapshot_store, target_dir)
+
+    # The rows of the directory being profiled, and the digest inputs of its files
+    directory_rows = []
+    directory_entries = []
+
+    def write_directory_rows(digest):
+        """Writes the held rows of a directory with its digest, then clears them"""
+        for reference_row in directory_rows:
+            reference_row["Directory Digest"] = digest
+            writer.write_row(reference_row)
+            if snapshot_writer is not None:
+                snapshot_writer.write_row(reference_row)
+        directory_rows.clear()
+        directory_entries.clear()
+
+    try:
+        with timed_phase(run_log, "Profile", {"Workers": workers}):
+            profile_results = profile_files(paths_to_profile, workers, timeout_seconds,
+                                            **profile_options, **profile_limits)
+            for path, directory, file_name, file_type, stat_key in crawled_files:
+                # A directory's files are crawled together, so it's done once the next one starts
+                if directory_rows and directory_rows[-1]["Directory"] != directory:
+                    previous_directory = directory_rows[-1]["Directory"]
+                    write_directory_rows(directory_digest(directory_entries, sub_directory_names[previous_directory]))
+
+                result = cached_result(path, stat_key)
+                if result is not None:
+                    reference_values, message = result
+                    if run_log is not None:
+                        run_log.record_file({"FilePath": path, "Outcome": "Cached", "Seconds": None})
+                else:
+                    reference_values, message, file_stats = next(profile_results)
+                    files_profiled += 1
+                    files_skipped += file_stats["Outcome"] in (SKIPPED_TOO_LARGE, SKIPPED_TIMEOUT)
+                    if file_stats["Seconds"] is not None:
+                        file_latency.add(file_stats["Seconds"])
+                    if run_log is not None:
+                        run_log.record_file(file_stats)
+                    # Only successful reads are cached, so failures are retried next time
+                    if use_cache and stat_key is not None and reference_values["Max Column Count"] is not None:
+                        cache[path] = {"Stat": stat_key,
+                                       "Profile Options": profile_options,
+                                       "Cache Version": REFERENCE_CACHE_VERSION,
+                                       "Reference Values": reference_values,
+                                       "Message": message}
+
+                directory_rows.append({"FilePath": path,
+                                       "Directory": directory,
+                                       "FileName": file_name,
+                                       "FileType": file_type,
+                                       **reference_values})
+                directory_entries.append((file_name + file_type, stat_key, reference_values))
+                message_list.append(message)
+                files_done += 1
+                report_progress(path)
+                if cancel_event is not None and cancel_event.is_set() and files_done < len(crawled_files):
+                    # Closing the generator straight away so no more files are started
+                    profile_results.close()
+                    cancelled = True
+                    break
+
+            # The last directory, which has no digest if the run stopped part way through it
+            if directory_rows:
+                write_directory_rows(None if cancelled else directory_digest(
+                    directory_entries, sub_directory_names[directory_rows[-1]["Directory"]]))
+
+        run_summary = {**crawl_summary,
+                       "Files Profiled": files_done,
+                       "Cache Hits": cache_hits,
+                       "Cache Misses": len(paths_to_profile),
+                       "Cache Evictions": 0,
+                       "Files Skipped": files_skipped,
+                       **file_latency.summary("File Seconds"),
+                       "Cancelled": cancelled}
+        if cancelled:
+            # Only the files done before the cancel count
+            run_summary["Cache Hits"] = files_done - files_profiled
+            run_summary["Cache Misses"] = files_profiled
+
+        with timed_phase(run_log, "Write", {"Reference Format": reference_format}):
+            if use_cache:
+                # Evicting entries for files in this directory which no longer exist
+                target_prefix = os.path.join(target_dir, "")
+                paths_found = {crawled_file[0] for crawled_file in crawled_files}
+                deleted_paths = [path for path in cache if path.startswith(target_prefix) and path not in paths_found]
+                for path in deleted_paths:
+                    del cache[path]
+                run_summary["Cache Evictions"] = len(deleted_paths)
+                save_reference_cache(cache_path, cache)
+
+            # Marking the file name if it only covers part of the directory
+            if cancelled:
+                writer.path = timestamped_output_path(save_folder, "ReferenceFile Partial", "." + reference_format)
+            run_summary["Reference File"] = writer.commit()
+            if snapshot_writer is not None:
+                run_summary["Snapshot ID"] = snapshot_writer.commit(run_summary["Reference File"], not cancelled)
+    finally:
+        # Leaves the partial file behind if the run failed part way, for finding where it stopped
+        writer.close()
+        if snapshot_writer is not None:
+            snapshot_writer.close()
+
+    message_list.append(' | '.join([': '.join([name, str(value)]) for name, value in run_summary.items()
+                                    if name not in ("Reference File", "Snapshot ID")]))
+    if run_log is not None:
+        message_list.extend(summary_messages(run_log.summary()))
+
+    return run_summary
@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+from .comparer import compare_references, compared_columns
+from .instrumentation import timed_phase
+from .reference import INTEGER_COLUMNS, REFERENCE_COLUMNS, header_list, iter_reference_chunks
+
+# |||||||||||||||||||
+# SNAPSHOT HISTORY
+# |||||||||||||||||||
+
+# Name of the snapshot store kept next to the reference files, when the window saves snapshots
+SNAPSHOT_STORE_NAME = "Snapshots.sqlite"
+
+# Rows read from a reference at a time when importing it
+IMPORT_CHUNK_ROWS = 10000
+
+
+def open_snapshot_store(store_path):
+    """Function to open a snapshot store, a SQLite database holding every snapshot added
+    to it. The store is made if it doesn't exist, and reference columns added since it
+    was made are added to it, so older stores keep working. Files are indexed on path
+    then snapshot, and on snapshot, so both a file's history and a whole snapshot are
+    read without scanning the table. Returns the connection"""
+    connection = sqlite3.connect(store_path)
+    connection.execute("CREATE TABLE IF NOT EXISTS snapshots ("
+                       "snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                       "created TEXT NOT NULL, "
+                       "source TEXT, "
+                       "reference_file TEXT, "
+                       "file_count INTEGER, "
+                       "complete INTEGER NOT NULL DEFAULT 0)")
+    connection.execute("CREATE TABLE IF NOT EXISTS files ("
+                       "snapshot_id INTEGER NOT NULL REFERENCES snapshots (snapshot_id))")
+
+    # Reference columns are stored under their own names, header lists as json
+    stored_columns = {row[1] for row in connection.execute("PRAGMA table_info(files)")}
+    for col in REFERENCE_COLUMNS:
+        if col not in stored_columns:
+            connection.execute('ALTER TABLE files ADD COLUMN "{}" {}'.format(
+                col, "INTEGER" if col in INTEGER_COLUMNS else "TEXT"))
+
+    connection.execute('CREATE INDEX IF NOT EXISTS files_path_snapshot ON files ("FilePath", snapshot_id)')
+    connection.execute('CREATE INDEX IF NOT EXISTS files_snapshot ON files (snapshot_id)')
+    connection.commit()
+    return connection
+
+
+def quoted_columns(columns):
+    """Function to join column names for SQL, quoted since they have spaces"""
+    return ", ".join('"{}"'.format(col) for col in columns)
+
+
+class SnapshotWriter:
+    """Adds a snapshot to a store a row at a time, like a ReferenceWriter. The whole
+    snapshot is written in one transaction, so other connections only see it once commit
+    is called, and a build that fails part way leaves nothing in the store"""
+
+    def __init__(self, store_path, source, created=None):
+        self.connection = open_snapshot_store(store_path)
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+        self.snapshot_id = self.connection.execute("INSERT INTO snapshots (created, source) VALUES (?, ?)",
+                                                   (self.created, source)).lastrowid
+        self.file_count = 0
+        self.insert_sql = "INSERT INTO files (snapshot_id, {}) VALUES ({})".format(
+            quoted_columns(REFERENCE_COLUMNS), ", ".join("?" * (len(REFERENCE_COLUMNS) + 1)))
+
+    def write_row(self, row):
+        """Adds a row, given as a dictionary of reference column names to values"""
+        values = [row.get(col) for col in REFERENCE_COLUMNS]
+        headers_index = REFERENCE_COLUMNS.index("Headers List")
+        if values[headers_index] is not None:
+            values[headers_index] = json.dumps(values[headers_index])
+        self.connection.execute(self.insert_sql, [self.snapshot_id] + values)
+        self.file_count += 1
+
+    def commit(self, reference_file=None, complete=True):
+        """Finishes the snapshot, marking if it covers the whole directory. Returns its id"""
+        self.connection.execute("UPDATE snapshots SET reference_file = ?, file_count = ?, complete = ? "
+                                "WHERE snapshot_id = ?",
+                                (reference_file, self.file_count, int(complete), self.snapshot_id))
+        self.connection.commit()
+        self.close()
+        return self.snapshot_id
+
+    def close(self):
+        """Closes the store, dropping the snapshot if it wasn't committed"""
+        if self.connection is not None:
+            self.connection.rollback()
+            self.connection.close()
+            self.connection = None
+
+
+def import_reference(store_path, reference_path):
+    """Function to add a reference file already built, in any of the REFERENCE_FORMATS,
+    to a snapshot store. The snapshot is dated by when the file was last modified.
+    Returns the id of the new snapshot"""
+    created = datetime.fromtimestamp(os.path.getmtime(reference_path)).isoformat(timespec="seconds")
+    writer = SnapshotWriter(store_path, reference_path, created)
+    try:
+        for chunk in iter_reference_chunks(reference_path, chunk_rows=IMPORT_CHUNK_ROWS):
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.to_dict(orient="records"):
+                writer.write_row(row)
+        return writer.commit(reference_path)
+    finally:
+        writer.close()
+
+
+def list_snapshots(store_path):
+    """Function to list the snapshots in a store, oldest first, as dictionaries"""
+    with closing(open_snapshot_store(store_path)) as connection:
+        rows = connection.execute("SELECT snapshot_id, created, source, reference_file, file_count, complete "
+                                  "FROM snapshots ORDER BY snapshot_id").fetchall()
+    return [{"Snapshot ID": snapshot_id,
+             "Created": created,
+             "Source": source,
+             "Reference File": reference_file,
+             "Files": file_count,
+             "Complete": bool(complete)}
+            for snapshot_id, created, source, reference_file, file_count, complete in rows]
+
+
+def read_snapshot(store_path, snapshot_id, columns=None):
+    """Function to read a snapshot as a DataFrame shaped like read_reference gives, with
+    only the named columns if given. Raises ValueError if there's no such snapshot"""
+    import pandas as pd
+
+    selected = [col for col in REFERENCE_COLUMNS if columns is None or col in columns]
+    with closing(open_snapshot_store(store_path)) as connection:
+        if connection.execute("SELECT 1 FROM snapshots WHERE snapshot_id = ?", (snapshot_id,)).fetchone() is None:
+            raise ValueError("No snapshot with id " + str(snapshot_id))
+        snapshot_df = pd.read_sql_query("SELECT {} FROM files WHERE snapshot_id = ? ORDER BY rowid".format(
+            quoted_columns(selected)), connection, params=(snapshot_id,))
+
+    if "Headers List" in snapshot_df.columns:
+        snapshot_df["Headers List"] = [header_list(None if value is None else json.loads(value))
+                                       for value in snapshot_df["Headers List"]]
+    return snapshot_df
+
+
+def compare_snapshots(store_path, pre_snapshot_id, post_snapshot_id, cols_to_check, run_log=None):
+    """Function to compare two snapshots in a store, giving the same DataFrame as
+    reference_comparer does for the references they were built as"""
+    needed_cols = compared_columns(cols_to_check)
+    with timed_phase(run_log, "Compare Read"):
+        pre_df = read_snapshot(store_path, pre_snapshot_id, needed_cols)
+        post_df = read_snapshot(store_path, post_snapshot_id, needed_cols)
+    return compare_references(pre_df, post_df, cols_to_check, run_log)
+
+
+def header_history(store_path, file_path):
+    """Function to list each snapshot where a file's headers changed, in the order the
+    snapshots were made, starting with the first snapshot the file is in. Only the file's
+    own rows are read, through the path index. Each change is a dictionary with the
+    snapshot and the headers before and after"""
+    with closing(open_snapshot_store(store_path)) as connection:
+        rows = connection.execute('SELECT files.snapshot_id, snapshots.created, files."Headers List" '
+                                  'FROM files JOIN snapshots ON files.snapshot_id = snapshots.snapshot_id '
+                                  'WHERE files."FilePath" = ? ORDER BY snapshots.created, files.snapshot_id',
+                                  (file_path,)).fetchall()
+
+    changes = []
+    previous_headers = None
+    for snapshot_id, created, headers_json in rows:
+        headers = header_list(None if headers_json is None else json.loads(headers_json))
+        if not changes or headers != previous_headers:
+            changes.append({"Snapshot ID": snapshot_id,
+                            "Created": created,
+                            "Headers List": headers,
+                            "Previous Headers List": None if not changes else previous_headers})
+        previous_headers = headers
+    return changes
+
+
+def headers_last_changed(store_path, file_path):
+    """Function to find the snapshot where a file's headers last changed, see header_history.
+    Returns None if the file isn't in any snapshot"""
+    changes = header_history(store_path, file_path)
+    return changes[-1] if changes else None
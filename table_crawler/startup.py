@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# |||||||||||||||||||
+# STARTUP BUDGET
+# |||||||||||||||||||
+
+# Seconds allowed for importing the package, and for a cold start of a fresh
+# interpreter up to the point the command line is ready to run
+IMPORT_TIME_BUDGET_SECONDS = 0.25
+COLD_START_BUDGET_SECONDS = 1.0
+
+# Modules which are too slow to import up front, so should only load on the code paths that use them
+HEAVY_MODULES = ("pandas", "openpyxl", "PySimpleGUI", "pyperclip")
+
+
+def measure_startup():
+    """Function to measure how long importing the package and the command line takes
+    in a fresh interpreter, and which heavy modules that import pulled in. Returns a
+    dictionary of the measurements, with whether they're all within budget"""
+    probe = '; '.join(["import json, sys, time",
+                       "start = time.perf_counter()",
+                       "import table_crawler, table_crawler.cli",
+                       "import_seconds = time.perf_counter() - start",
+                       "heavy_modules = [name for name in {!r} if name in sys.modules]".format(HEAVY_MODULES),
+                       "print(json.dumps({'Import Seconds': import_seconds, 'Heavy Modules Loaded': heavy_modules}))"])
+
+    # Running from the folder above the package so the fresh interpreter imports this copy of it
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", probe], cwd=package_parent, capture_output=True, text=True,
+                               check=True)
+    cold_start_seconds = time.perf_counter() - start
+
+    startup_summary = json.loads(completed.stdout)
+    startup_summary["Cold Start Seconds"] = cold_start_seconds
+    startup_summary["Import Budget Seconds"] = IMPORT_TIME_BUDGET_SECONDS
+    startup_summary["Cold Start Budget Seconds"] = COLD_START_BUDGET_SECONDS
+    startup_summary["Within Budget"] = (startup_summary["Import Seconds"] <= IMPORT_TIME_BUDGET_SECONDS
+                                        and cold_start_seconds <= COLD_START_BUDGET_SECONDS
+                                        and not startup_summary["Heavy Modules Loaded"])
+    return startup_summary
@@ -0,0 +1,301 @@
+import csv
+import heapq
+import itertools
+import json
+import os
+import pickle
+import tempfile
+from contextlib import ExitStack
+from operator import itemgetter
+
+from .comparer import (CONTENT_CHECK_SOURCE, HEADERS_CHECK_SOURCE, MATCH_TYPE_NAMES, PROFILE_CHECK_SOURCE,
+                       header_differences, name_check_source, profile_differences)
+from .instrumentation import timed_phase
+from .reference import iter_reference_chunks, reference_columns
+
+# |||||||||||||||||||
+# Streaming comparer for references too big to hold in memory
+# |||||||||||||||||||
+
+# Rows held in memory at once by each sort, before they are spilled to disk as a sorted run
+DEFAULT_MAX_ROWS_IN_MEMORY = 100000
+
+# Sorted runs merged at once, so a huge reference can't run out of file handles
+MAX_RUNS_PER_MERGE = 64
+
+# Columns of the comparison file, after the row number
+COMPARISON_COLUMNS = ["Value", "Match Type", "Check Source", "Header Value"]
+
+
+def null_last_key(value):
+    """Sort key putting missing values after every string, like pandas sort_values does"""
+    return (1, "") if value is None else (0, value)
+
+
+def missing_as_none(value):
+    """Function to turn the NaN pandas reads missing values as into None"""
+    return None if isinstance(value, float) and value != value else value
+
+
+def open_run(temp_dir):
+    """Function to open a new temporary file to spill records to with spill_record.
+    The file is kept when closed, and has to be removed once it has been read"""
+    return tempfile.NamedTemporaryFile('wb', dir=temp_dir, suffix=".run", delete=False)
+
+
+def spill_record(f, record):
+    """Function to append a record to a file opened with open_run"""
+    pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_run(records, temp_dir):
+    """Function to spill records to a temporary file in order, returning its path"""
+    with open_run(temp_dir) as f:
+        for record in records:
+            spill_record(f, record)
+    return f.name
+
+
+def read_run(path):
+    """Generator that yields the records spilled to a file by write_run, in order"""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def external_sort(records, key, max_rows_in_memory, temp_dir):
+    """Generator that yields records sorted on key, holding at most max_rows_in_memory
+    of them in memory. Bigger inputs are sorted in runs which are spilled to disk, and
+    then merged back together. The sort is stable, like Python's own"""
+    run_paths = []
+    try:
+        buffer = []
+        for record in records:
+            buffer.append(record)
+            if len(buffer) >= max_rows_in_memory:
+                buffer.sort(key=key)
+                run_paths.append(write_run(buffer, temp_dir))
+                buffer = []
+        buffer.sort(key=key)
+
+        if not run_paths:
+            yield from buffer
+            return
+        if buffer:
+            run_paths.append(write_run(buffer, temp_dir))
+
+        # Merging groups of runs into bigger runs until they can all be merged at once.
+        # Runs stay in input order, and heapq.merge takes ties from earlier runs first
+        while len(run_paths) > MAX_RUNS_PER_MERGE:
+            merged_paths = []
+            for start in range(0, len(run_paths), MAX_RUNS_PER_MERGE):
+                group_paths = run_paths[start:start + MAX_RUNS_PER_MERGE]
+                merged_paths.append(write_run(heapq.merge(*map(read_run, group_paths), key=key), temp_dir))
+                for path in group_paths:
+                    os.remove(path)
+            run_paths = merged_paths
+
+        yield from heapq.merge(*map(read_run, run_paths), key=key)
+    finally:
+        for path in run_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def merge_groups(left, right, key):
+    """Generator that walks two record streams sorted on key together, yielding each key
+    with an iterator of its records on each side. A side without the key gets an empty
+    iterator. Groups have to be used before moving on, as the streams are only read once"""
+    left_groups = itertools.groupby(left, key)
+    right_groups = itertools.groupby(right, key)
+    left_group = next(left_groups, None)
+    right_group = next(right_groups, None)
+    while left_group is not None or right_group is not None:
+        if right_group is None or (left_group is not None and left_group[0] < right_group[0]):
+            yield left_group[0], left_group[1], iter(())
+            left_group = next(left_groups, None)
+        elif left_group is None or right_group[0] < left_group[0]:
+            yield right_group[0], iter(()), right_group[1]
+            right_group = next(right_groups, None)
+        else:
+            yield left_group[0], left_group[1], right_group[1]
+            left_group = next(left_groups, None)
+            right_group = next(right_groups, None)
+
+
+def reference_records(path, columns, chunk_rows):
+    """Generator that yields (row number, values of columns) for each row of a reference,
+    reading it chunk_rows rows at a time"""
+    row_number = 0
+    for chunk in iter_reference_chunks(path, columns, chunk_rows):
+        for values in zip(*[chunk[col] for col in columns]):
+            yield row_number, tuple(missing_as_none(value) for value in values)
+            row_number += 1
+
+
+def name_check_rows(pre_ref, post_ref, col_name, max_rows_in_memory, temp_dir):
+    """Generator that yields the (value, match type) name check differences on a column,
+    in the same order as the in memory comparer. Values are matched by sorting both
+    references on the column, and the differences are sorted back into reference order"""
+
+    def sorted_values(path):
+        """Streams the column's values sorted on the value, then the row number"""
+        return external_sort(((row_number, values[0]) for row_number, values
+                              in reference_records(path, [col_name], max_rows_in_memory)),
+                             lambda record: null_last_key(record[1]), max_rows_in_memory, temp_dir)
+
+    run_paths = {}
+    try:
+        with ExitStack() as stack:
+            run_files = {}
+            for match_type in ("Missing in new reference", "Added in new ref file"):
+                run_files[match_type] = stack.enter_context(open_run(temp_dir))
+                run_paths[match_type] = run_files[match_type].name
+
+            for value_key, pre_group, post_group in merge_groups(sorted_values(pre_ref), sorted_values(post_ref),
+                                                                 lambda record: null_last_key(record[1])):
+                # Values in both references aren't differences, so only one record of each side is needed
+                pre_first = next(pre_group, None)
+                post_first = next(post_group, None)
+                if post_first is None:
+                    for record in itertools.chain([pre_first], pre_group):
+                        spill_record(run_files["Missing in new reference"], record)
+                elif pre_first is None:
+                    for record in itertools.chain([post_first], post_group):
+                        spill_record(run_files["Added in new ref file"], record)
+
+        # Putting each side back into the order of its reference
+        for match_type in sorted(run_paths, key=MATCH_TYPE_NAMES.get):
+            for row_number, value in external_sort(read_run(run_paths[match_type]), itemgetter(0),
+                                                   max_rows_in_memory, temp_dir):
+                yield value, MATCH_TYPE_NAMES[match_type]
+    finally:
+        for path in run_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def streaming_reference_comparer(pre_ref, post_ref, cols_to_check, output_path,
+                                 max_rows_in_memory=DEFAULT_MAX_ROWS_IN_MEMORY, temp_dir=None, run_log=None):
+    """Function to compare two reference files like reference_comparer, without loading
+    either into memory. Both references are sorted on the compared column in runs of at
+    most max_rows_in_memory rows, spilling to temp_dir when bigger, and merged in one pass.
+    Differences are written to output_path as they are found, giving the same csv as
+    saving the in memory comparer's DataFrame. Pass a RunLog as run_log to time the join
+    pass and the writing pass, which also runs the name checks. Returns the number of
+    differences found"""
+    pre_columns = reference_columns(pre_ref)
+    post_columns = reference_columns(post_ref)
+    fingerprint_compared = "Content Fingerprint" in pre_columns and "Content Fingerprint" in post_columns
+    profile_compared = "Column Profile" in pre_columns and "Column Profile" in post_columns
+    join_columns = (["FilePath", "Headers List"] + (["Content Fingerprint"] if fingerprint_compared else [])
+                    + (["Column Profile"] if profile_compared else []))
+
+    def sorted_on_path(path):
+        """Streams the rows of a reference sorted on FilePath, then the row number"""
+        return external_sort(reference_records(path, join_columns, max_rows_in_memory),
+                             lambda record: null_last_key(record[1][0]), max_rows_in_memory, temp_dir)
+
+    run_paths = {}
+    profile_run_paths = {}
+    content_run_path = None
+    try:
+        # |||||||||||||||||||||
+        # ||| Header and content differences, from one pass over both references joined on FilePath |||
+        # |||||||||||||||||||||
+
+        # Differences come out in FilePath order, which is the order header differences are
+        # output in within each match type, so they're spilled straight to a run per match type
+        with timed_phase(run_log, "Compare Join"), ExitStack() as stack:
+            run_files = {}
+
+            def spill_difference(match_type, record, paths=run_paths):
+                """Appends a difference to the run for its match type, opening it if needed
+                and keeping its path in paths, which is run_paths unless given"""
+                # Profile match types get their own runs, even if one shares a header match type's name
+                run_key = (paths is profile_run_paths, match_type)
+                if run_key not in run_files:
+                    run_files[run_key] = stack.enter_context(open_run(temp_dir))
+                    paths[match_type] = run_files[run_key].name
+                spill_record(run_files[run_key], record)
+
+            for path_key, pre_group, post_group in merge_groups(sorted_on_path(pre_ref), sorted_on_path(post_ref),
+                                                                lambda record: null_last_key(record[1][0])):
+                # Rows sharing a path are paired up like an inner merge, in the order of each reference
+                post_records = list(post_group)
+                for pre_row_number, pre_values in pre_group:
+                    for post_row_number, post_values in post_records:
+                        file_path = pre_values[0]
+                        for header, match_type in header_differences(pre_values[1], post_values[1]):
+                            spill_difference(MATCH_TYPE_NAMES.get(match_type, match_type), (file_path, header))
+
+                        if profile_compared and None not in (file_path, pre_values[-1], post_values[-1]):
+                            for header, match_type in profile_differences(json.loads(pre_values[-1]),
+                                                                          json.loads(post_values[-1])):
+                                spill_difference(match_type, (file_path, header), profile_run_paths)
+
+                        # Fingerprints of different types can't be compared, so checking the type prefix matches
+                        if fingerprint_compared and None not in (file_path, pre_values[2], post_values[2]):
+                            if (pre_values[2].split(":")[0] == post_values[2].split(":")[0]
+                                    and pre_values[2] != post_values[2]):
+                                spill_difference("Content changed", (pre_row_number, post_row_number, file_path))
+
+        # |||||||||||||||||||||
+        # ||| Writing each check source's differences in the output order |||
+        # |||||||||||||||||||||
+
+        content_run_path = run_paths.pop("Content changed", None)
+        header_run_paths = run_paths
+
+        def content_rows():
+            """Content changes in the order of the expected reference"""
+            if content_run_path is None:
+                return
+            for pre_row_number, post_row_number, file_path in external_sort(read_run(content_run_path),
+                                                                             itemgetter(0, 1), max_rows_in_memory,
+                                                                             temp_dir):
+                yield file_path, "Content changed", None
+
+        def header_rows():
+            """Header differences grouped by match type, each in FilePath order"""
+            for match_type in sorted(header_run_paths):
+                for file_path, header in read_run(header_run_paths[match_type]):
+                    yield file_path, match_type, header
+
+        def profile_rows():
+            """Column profile differences grouped by match type, each in FilePath order"""
+            for match_type in sorted(profile_run_paths):
+                for file_path, header in read_run(profile_run_paths[match_type]):
+                    yield file_path, match_type, header
+
+        def name_rows(col_name):
+            """Name check differences on one column"""
+            for value, match_type in name_check_rows(pre_ref, post_ref, col_name, max_rows_in_memory, temp_dir):
+                yield value, match_type, None
+
+        sections = [(name_check_source(col_name), lambda col_name=col_name: name_rows(col_name))
+                    for col_name in cols_to_check]
+        sections.append((HEADERS_CHECK_SOURCE, header_rows))
+        if fingerprint_compared:
+            sections.append((CONTENT_CHECK_SOURCE, content_rows))
+        if profile_compared:
+            sections.append((PROFILE_CHECK_SOURCE, profile_rows))
+
+        differences_found = 0
+        with timed_phase(run_log, "Compare Write"), open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow([""] + COMPARISON_COLUMNS)
+            for check_source, section_rows in sorted(sections, key=itemgetter(0)):
+                for value, match_type, header in section_rows():
+                    writer.writerow([differences_found, "" if value is None else value, match_type, check_source,
+                                     "" if header is None else header])
+                    differences_found += 1
+
+        return differences_found
+    finally:
+        for path in list(run_paths.values()) + list(profile_run_paths.values()) + [content_run_path]:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,335 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from .comparer import (CONTENT_CHECK_SOURCE, HEADERS_CHECK_SOURCE, MATCH_TYPE_NAMES, header_differences,
+                       name_check_source)
+from .crawler import DEFAULT_EXCLUDE_GLOBS, DEFAULT_PRUNE_GLOBS, scan_directory, walk_directory
+from .profiling import DEFAULT_SCAN_ROWS, profile_files, registered_file_types
+from .reference import header_list
+
+# |||||||||||||||||||
+# WATCH MODE
+# |||||||||||||||||||
+
+# Seconds between stat snapshots when polling, and the longest wait for inotify events
+# before a full snapshot is taken anyway, in case an event was missed
+DEFAULT_POLL_SECONDS = 5.0
+INOTIFY_RESCAN_SECONDS = 300.0
+
+# Seconds to keep collecting inotify events after the first, so a file being written
+# in many small chunks is only profiled once it has settled
+INOTIFY_SETTLE_SECONDS = 0.5
+
+# Columns name checked by watch mode, the same as the app compares
+WATCH_NAME_COLUMNS = ("FilePath", "Directory", "FileName")
+
+# Event masks from <sys/inotify.h>, for the directory changes that can affect a reference
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+INOTIFY_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+                      | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+# |||||||||||||||||||
+# Tree snapshots
+# |||||||||||||||||||
+
+
+def snapshot_tree(directory, crawl_options):
+    """Function to take a stat snapshot of a directory tree. Returns a dictionary of each
+    directory walked to a tuple of its files and sub directories, see scan_directory"""
+    return {current_directory: (files, sub_directories)
+            for current_directory, files, sub_directories in walk_directory(directory, **crawl_options)}
+
+
+def drop_subtree(tree, directory):
+    """Function to remove a directory and everything under it from a tree snapshot"""
+    directories_to_drop = [directory]
+    while directories_to_drop:
+        files, sub_directories = tree.pop(directories_to_drop.pop(), ((), ()))
+        directories_to_drop.extend(sub_directories)
+
+
+def refresh_tree(tree, directories, crawl_options):
+    """Function to update a tree snapshot by re-scanning only the given directories.
+    New sub directories are walked in full, and ones which have gone are dropped.
+    Returns the updated snapshot, leaving the old one as it was"""
+    tree = dict(tree)
+    # Parents first, so a directory dropped with its parent isn't re-scanned
+    for directory in sorted(directories, key=len):
+        if directory not in tree:
+            continue
+        try:
+            files, sub_directories = scan_directory(directory, **crawl_options)
+        except OSError:
+            drop_subtree(tree, directory)
+            continue
+        old_sub_directories = tree[directory][1]
+        tree[directory] = (files, sub_directories)
+        for sub_directory in old_sub_directories:
+            if sub_directory not in sub_directories:
+                drop_subtree(tree, sub_directory)
+        for sub_directory in sub_directories:
+            if sub_directory not in tree:
+                tree.update(snapshot_tree(sub_directory, crawl_options))
+    return tree
+
+
+def tree_files(tree, directory):
+    """Function to flatten a tree snapshot into a dictionary of each file path to its
+    (directory, file name, size and modified time), in the same order as crawl_files"""
+    files_found = {}
+    directories_to_walk = [directory]
+    while directories_to_walk:
+        current_directory = directories_to_walk.pop()
+        if current_directory not in tree:
+            continue
+        files, sub_directories = tree[current_directory]
+        for file_path, file_name, file_type, file_size, modified_time in files:
+            files_found[file_path] = (current_directory, file_name, (file_size, modified_time))
+        directories_to_walk.extend(reversed(sub_directories))
+    return files_found
+
+
+# |||||||||||||||||||
+# Linux inotify, through libc so no extra packages are needed
+# |||||||||||||||||||
+
+
+def inotify_open():
+    """Function to start an inotify instance. Returns the libc handle and the file
+    descriptor to read events from, or None where inotify isn't available"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    return libc, fd
+
+
+def inotify_watch_tree(inotify, tree, watched_directories):
+    """Function to make the inotify watches match the directories of a tree snapshot,
+    watching new directories and removing watches on ones which have gone or moved.
+    watched_directories maps watch descriptors to directories, and is updated in place.
+    Returns False if the system ran out of watches"""
+    libc, fd = inotify
+    for watch_descriptor, directory in list(watched_directories.items()):
+        if directory not in tree:
+            libc.inotify_rm_watch(fd, watch_descriptor)
+            del watched_directories[watch_descriptor]
+    already_watched = set(watched_directories.values())
+    for directory in tree:
+        if directory in already_watched:
+            continue
+        watch_descriptor = libc.inotify_add_watch(fd, os.fsencode(directory), INOTIFY_WATCH_MASK)
+        if watch_descriptor < 0:
+            if ctypes.get_errno() == 28:
+                # ENOSPC, the user's watch limit has been reached
+                return False
+            # The directory went before it could be watched, the next scan will see that
+            continue
+        watched_directories[watch_descriptor] = directory
+    return True
+
+
+def inotify_changed_directories(inotify, watched_directories, timeout):
+    """Function to wait up to timeout seconds for inotify events, then keep collecting
+    them until they settle. Returns the set of directories with events, an empty set if
+    the wait timed out, or None if events were lost and a full snapshot is needed"""
+    libc, fd = inotify
+    changed_directories = set()
+    wait = timeout
+    while True:
+        readable, _, _ = select.select([fd], [], [], wait)
+        if not readable:
+            return changed_directories
+        try:
+            buffer = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            continue
+        offset = 0
+        while offset < len(buffer):
+            watch_descriptor, mask, cookie, name_length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT_HEADER.size + name_length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            directory = watched_directories.get(watch_descriptor)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                # The watch was removed along with its directory
+                del watched_directories[watch_descriptor]
+            # Changes to a directory itself show up in its parent, so both are re-scanned
+            changed_directories.add(directory)
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                changed_directories.add(os.path.dirname(directory))
+        wait = INOTIFY_SETTLE_SECONDS
+
+
+def inotify_close(inotify):
+    """Function to close an inotify instance, removing all of its watches"""
+    os.close(inotify[1])
+
+
+# |||||||||||||||||||
+# Diff records
+# |||||||||||||||||||
+
+
+def watch_differences(old_files, new_files, old_profiles, new_profiles):
+    """Function to find the differences between two snapshots of the same tree, as the
+    rows reference_comparer would give for references built from each. Only files which
+    were added, removed or profiled again are looked at for header and content changes.
+    Returns a list of dictionaries with the Value, Match Type, Check Source and Header
+    Value columns of the comparer, sorted in the same way"""
+    differences = []
+
+    def add_difference(value, match_type, check_source, header=None):
+        """Adds a row in the comparer's schema, giving match types their short names"""
+        differences.append({"Value": value,
+                            "Match Type": MATCH_TYPE_NAMES.get(match_type, match_type),
+                            "Check Source": check_source,
+                            "Header Value": header})
+
+    removed_paths = [path for path in old_files if path not in new_files]
+    added_paths = [path for path in new_files if path not in old_files]
+
+    # Name checks match every row's value against all of the other snapshot's values
+    if removed_paths or added_paths:
+        value_getters = {"FilePath": lambda path, details: path,
+                         "Directory": lambda path, details: details[0],
+                         "FileName": lambda path, details: details[1]}
+        for col_name in WATCH_NAME_COLUMNS:
+            get_value = value_getters[col_name]
+            old_values = {get_value(path, details) for path, details in old_files.items()}
+            new_values = {get_value(path, details) for path, details in new_files.items()}
+            for path in removed_paths:
+                value = get_value(path, old_files[path])
+                if value not in new_values:
+                    add_difference(value, "Missing in new reference", name_check_source(col_name))
+            for path in added_paths:
+                value = get_value(path, new_files[path])
+                if value not in old_values:
+                    add_difference(value, "Added in new ref file", name_check_source(col_name))
+
+    # Header and content checks, for files in both snapshots which were profiled again.
+    # Content changes keep the order of the old snapshot, header changes are in path order
+    header_rows = []
+    for path in old_files:
+        if path not in new_profiles or path not in old_profiles:
+            continue
+        old_values = old_profiles[path]
+        new_values = new_profiles[path]
+        for header, match_type in header_differences(header_list(old_values["Headers List"]),
+                                                     header_list(new_values["Headers List"])):
+            header_rows.append((path, match_type, header))
+
+        old_fingerprint = old_values["Content Fingerprint"]
+        new_fingerprint = new_values["Content Fingerprint"]
+        if (old_fingerprint is not None and new_fingerprint is not None
+                and old_fingerprint.split(":")[0] == new_fingerprint.split(":")[0]
+                and old_fingerprint != new_fingerprint):
+            add_difference(path, "Content changed", CONTENT_CHECK_SOURCE)
+
+    for path, match_type, header in sorted(header_rows, key=lambda row: row[0]):
+        add_difference(path, match_type, HEADERS_CHECK_SOURCE, header)
+
+    # Sorting the same way as the comparer, which keeps rows of a match type in the order found
+    differences.sort(key=lambda row: (row["Check Source"], row["Match Type"]))
+    return differences
+
+
+def watch_directory(directory, poll_seconds=DEFAULT_POLL_SECONDS, use_inotify=True, scan_rows=DEFAULT_SCAN_ROWS,
+                    workers=1, fingerprint=None, include_globs=None, exclude_globs=DEFAULT_EXCLUDE_GLOBS,
+                    prune_globs=DEFAULT_PRUNE_GLOBS, stop_event=None):
+    """Generator that watches a directory and yields a list of difference rows each time
+    something changes, in the same schema as reference_comparer. The tree is kept as an
+    in memory stat snapshot, and only new files and files whose size or modified time
+    changed are profiled again, with the same options as build_reference.
+    Changes are found by taking a new stat snapshot every poll_seconds, or on Linux by
+    waiting for inotify events and re-scanning only the directories they were in.
+    Runs until stop_event (a threading.Event) is set, or the generator is closed"""
+    crawl_options = {"file_types": registered_file_types(),
+                     "include_globs": include_globs,
+                     "exclude_globs": exclude_globs,
+                     "prune_globs": prune_globs}
+    profile_options = {"scan_rows": scan_rows, "fingerprint": fingerprint}
+
+    tree = snapshot_tree(directory, crawl_options)
+    files = tree_files(tree, directory)
+    profiles = {}
+    for path, profile_result in zip(files, profile_files(list(files), workers, **profile_options)):
+        profiles[path] = profile_result[0]
+
+    inotify = inotify_open() if use_inotify else None
+    watched_directories = {}
+    if inotify is not None and not inotify_watch_tree(inotify, tree, watched_directories):
+        inotify_close(inotify)
+        inotify = None
+
+    last_full_snapshot = time.monotonic()
+
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if inotify is None:
+                if stop_event is None:
+                    time.sleep(poll_seconds)
+                elif stop_event.wait(poll_seconds):
+                    break
+                new_tree = snapshot_tree(directory, crawl_options)
+            else:
+                # Waking up every poll_seconds even without events, so stop_event is still checked
+                changed_directories = inotify_changed_directories(inotify, watched_directories, poll_seconds)
+                if changed_directories is None or time.monotonic() - last_full_snapshot >= INOTIFY_RESCAN_SECONDS:
+                    new_tree = snapshot_tree(directory, crawl_options)
+                    last_full_snapshot = time.monotonic()
+                elif changed_directories:
+                    new_tree = refresh_tree(tree, changed_directories, crawl_options)
+                else:
+                    continue
+                if not inotify_watch_tree(inotify, new_tree, watched_directories):
+                    inotify_close(inotify)
+                    inotify = None
+
+            new_files = tree_files(new_tree, directory)
+            paths_to_profile = [path for path, details in new_files.items()
+                                if path not in files or details[2] != files[path][2] or None in details[2]]
+            new_profiles = {}
+            for path, profile_result in zip(paths_to_profile,
+                                            profile_files(paths_to_profile, workers, **profile_options)):
+                new_profiles[path] = profile_result[0]
+
+            differences = watch_differences(files, new_files, profiles, new_profiles)
+
+            for path in files:
+                if path not in new_files:
+                    del profiles[path]
+            profiles.update(new_profiles)
+            tree = new_tree
+            files = new_files
+
+            if differences:
+                yield differences
+    finally:
+        if inotify is not None:
+            inotify_close(inotify)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Running the tests from a checkout, without installing the package
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Test trees and the references built from them in 2022, before encodings were detected
+TEST_FILES = os.path.join(REPO_ROOT, "Test Files")
@@ -0,0 +1,41 @@
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from conftest import TEST_FILES
+from table_crawler import build_reference, reference_comparer
+from table_crawler.reference import header_list
+
+# Where the shipped references were built, as written in their FilePath and Directory columns
+SHIPPED_TREE = "C:/Users/kylec/Documents/GitHub/Table-Crawler-Change-Detector-App/Test Files/Test Directory"
+
+
+def test_header_list_drops_byte_order_marks():
+    assert header_list("\ufeffDate|Place") == ["Date", "Place"]
+    assert header_list("\u00ef\u00bb\u00bfDate|Place") == ["Date", "Place"]
+    assert header_list(["Date", "Place"]) == ["Date", "Place"]
+    assert header_list(None) == []
+
+
+@pytest.mark.parametrize("shipped_name, tree_name", [("ReferenceFile 2022-06-11 06-13PM.csv", "Before"),
+                                                     ("ReferenceFile 2022-06-11 06-17PM.csv", "After")])
+def test_shipped_reference_matches_fresh_build(tmp_path, shipped_name, tree_name):
+    # Building the tree the shipped reference was made from, at a known path to swap in for the old one
+    tree = str(tmp_path / "Test Directory")
+    shutil.copytree(os.path.join(TEST_FILES, "Test Directory - {} Changes".format(tree_name)), tree)
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    build_reference(tree, str(output_folder))
+    fresh_path = glob.glob(str(output_folder / "ReferenceFile*.csv"))[0]
+
+    shipped_df = pd.read_csv(os.path.join(TEST_FILES, "Outputs", shipped_name), dtype=str)
+    for col in ("FilePath", "Directory"):
+        shipped_df[col] = [value.replace(SHIPPED_TREE, tree).replace("\\", "/") for value in shipped_df[col]]
+    shipped_path = str(tmp_path / "shipped.csv")
+    shipped_df.to_csv(shipped_path, index=False)
+
+    comparison_df = reference_comparer(shipped_path, fresh_path, ("FilePath", "Directory", "FileName"))
+    assert comparison_df.empty, comparison_df.to_string()
@@ -0,0 +1,6 @@
+from table_crawler.startup import measure_startup
+
+
+def test_startup_within_budget():
+    startup_summary = measure_startup()
+    assert startup_summary["Within Budget"], startup_summary
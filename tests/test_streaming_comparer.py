@@ -0,0 +1,47 @@
+import glob
+import os
+import shutil
+
+import pytest
+
+from conftest import TEST_FILES
+from table_crawler import build_reference, reference_comparer, streaming_reference_comparer
+
+COLS_TO_CHECK = ("FilePath", "Directory", "FileName")
+
+
+def build_tree_reference(tmp_path, tree_name, column_profile):
+    """Builds a reference of one of the test trees, always at the same path so the two can be compared.
+    A file whose column empties out is added, so profile drift is found too"""
+    tree = str(tmp_path / "tree")
+    shutil.rmtree(tree, ignore_errors=True)
+    shutil.copytree(os.path.join(TEST_FILES, "Test Directory - {} Changes".format(tree_name)), tree)
+    with open(os.path.join(tree, "Drift.csv"), "w") as f:
+        f.write("Id,Name\n1,a\n2,b\n" if tree_name == "Before" else "Id,Name\n,a\n,b\n")
+    output_folder = tmp_path / tree_name
+    output_folder.mkdir()
+    build_reference(tree, str(output_folder), fingerprint="full", column_profile=column_profile)
+    return glob.glob(str(output_folder / "ReferenceFile*.csv"))[0]
+
+
+@pytest.mark.parametrize("column_profile", [False, True])
+def test_streaming_matches_in_memory(tmp_path, column_profile):
+    pre_ref = build_tree_reference(tmp_path, "Before", column_profile)
+    post_ref = build_tree_reference(tmp_path, "After", column_profile)
+
+    in_memory_path = str(tmp_path / "in_memory.csv")
+    comparison_df = reference_comparer(pre_ref, post_ref, COLS_TO_CHECK)
+    comparison_df.to_csv(in_memory_path)
+
+    # Few enough rows in memory that every sort spills to several runs
+    streaming_path = str(tmp_path / "streaming.csv")
+    differences_found = streaming_reference_comparer(pre_ref, post_ref, COLS_TO_CHECK, streaming_path,
+                                                     max_rows_in_memory=3, temp_dir=str(tmp_path))
+
+    assert differences_found == len(comparison_df)
+    assert set(comparison_df["Check Source"]) >= {"Matched on FilePath - Compared Headers",
+                                                  "Matched on FilePath - Compared Content Fingerprint"}
+    if column_profile:
+        assert "Matched on FilePath - Compared Column Profile" in set(comparison_df["Check Source"])
+    with open(in_memory_path, "rb") as in_memory_file, open(streaming_path, "rb") as streaming_file:
+        assert in_memory_file.read() == streaming_file.read()